@@ -0,0 +1,174 @@
+"""Admission control for comparison runs.
+
+At most ``max_in_flight`` comparisons run at once. Up to ``max_queue`` more
+wait in FIFO order for ``queue_timeout`` seconds; anything beyond that is
+rejected straight away. Patient background work (batch items and jobs) may
+hold at most ``max_background`` slots, so interactive requests always have
+some left. Rejections carry a ``Retry-After`` estimate based on
+how long recent comparisons took, so clients back off instead of piling up
+coroutines and upstream connections.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_PATIENT_WAITING,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_REJECTIONS,
+)
+
+
+class Overloaded(Exception):
+    """Raised when a comparison cannot be admitted; maps to an HTTP 429 or 503."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__("The server is busy. Please retry in a few seconds.")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """In-flight limit with a short, bounded wait queue; ``max_in_flight=0`` admits everything."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float, max_background: Optional[int] = None):
+        self.max_in_flight = max_in_flight
+        # At least one slot stays reserved for interactive callers, unless there is only one
+        if max_in_flight > 0:
+            limit = max_in_flight - 1 if max_background is None else max_background
+            self.max_background = max(1, min(limit, max_in_flight - 1))
+        else:
+            self.max_background = 0
+        self.background_in_flight = 0
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        # Interactive callers in the bounded queue; patient callers are counted apart
+        self.waiting = 0
+        self.patient_waiting = 0
+        # Moving average of admitted run durations, for Retry-After
+        self.average_duration = 5.0
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self._background = asyncio.Semaphore(self.max_background) if max_in_flight > 0 else None
+        # Set whenever nothing is running, for draining on shutdown
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead has roughly drained."""
+        if not self.max_in_flight:
+            return 1
+        backlog = (self.waiting + 1) / self.max_in_flight
+        return max(1, min(60, math.ceil(self.average_duration * backlog)))
+
+    def check(self) -> None:
+        """Raise ``Overloaded`` if a new request would be rejected right now (no slot is taken)."""
+        if self._semaphore is not None and self._semaphore.locked() and self.waiting >= self.max_queue:
+            ADMISSION_REJECTIONS.inc(reason="queue_full")
+            raise Overloaded(429, "queue_full", self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self, patient: bool = False) -> AsyncIterator[None]:
+        """Hold one in-flight slot for the duration of the block.
+
+        ``patient`` callers (batch items and jobs, which already bound their
+        own concurrency) wait as long as needed and are counted in
+        ``patient_waiting`` instead of against the queue limit. They first
+        take one of ``max_background`` slots, so they can never fill every
+        in-flight slot.
+        """
+        if self._semaphore is None:
+            yield
+            return
+        if patient:
+            async with self._background_slot():
+                async with self._slot(patient=True):
+                    yield
+            return
+        self.check()
+        async with self._slot(patient=False):
+            yield
+
+    @asynccontextmanager
+    async def _background_slot(self) -> AsyncIterator[None]:
+        if self._background.locked():
+            self._count_waiting(True, 1)
+            try:
+                await self._background.acquire()
+            finally:
+                self._count_waiting(True, -1)
+        else:
+            await self._background.acquire()
+        self.background_in_flight += 1
+        try:
+            yield
+        finally:
+            self.background_in_flight -= 1
+            self._background.release()
+
+    @asynccontextmanager
+    async def _slot(self, patient: bool) -> AsyncIterator[None]:
+        if self._semaphore.locked():
+            self._count_waiting(patient, 1)
+            queued = time.perf_counter()
+            try:
+                if patient:
+                    await self._semaphore.acquire()
+                else:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except TimeoutError:
+                ADMISSION_REJECTIONS.inc(reason="queue_timeout")
+                raise Overloaded(503, "queue_timeout", self.retry_after()) from None
+            finally:
+                self._count_waiting(patient, -1)
+                ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - queued)
+        else:
+            await self._semaphore.acquire()
+            ADMISSION_QUEUE_WAIT.observe(0.0)
+
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        self._idle.clear()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            ADMISSION_IN_FLIGHT.set(self.in_flight)
+            if not self.in_flight:
+                self._idle.set()
+            self.average_duration = 0.8 * self.average_duration + 0.2 * (time.perf_counter() - started)
+            self._semaphore.release()
+
+    def _count_waiting(self, patient: bool, delta: int) -> None:
+        if patient:
+            self.patient_waiting += delta
+            ADMISSION_PATIENT_WAITING.set(self.patient_waiting)
+        else:
+            self.waiting += delta
+            ADMISSION_QUEUE_DEPTH.set(self.waiting)
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for running comparisons to finish; False if some are still running."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_background": self.max_background,
+            "background_in_flight": self.background_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "patient_waiting": self.patient_waiting,
+            "retry_after_s": self.retry_after(),
+        }
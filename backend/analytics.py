@@ -0,0 +1,218 @@
+"""Aggregate reports over the comparison history in ``result_store``.
+
+``HistoryColumns`` keeps an in-memory, columnar copy of the narrow
+``comparison_stats`` table: one NumPy array per column, with text columns
+dictionary-encoded as integer codes. Each report first appends rows added
+since the last one (read in batches), then filters, groups and computes
+percentiles, error rates, reply-length histograms and tool counts with array
+operations only. Parlant latency, reply lengths and tool usage only count
+rows with ``parlant_leg`` set, so a multi-model comparison (one row per
+model) counts its single Parlant run once.
+"""
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+GROUP_BY = ("model", "prompt_hash", "window", "none")
+PERCENTILES = (50, 95, 99)
+# Reply length histogram edges in characters; the last bucket is open-ended
+REPLY_LENGTH_EDGES = (0, 250, 500, 1000, 2000, 4000)
+
+_WINDOW = re.compile(r"^(\d+)([mhd])$")
+_WINDOW_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+
+_NUMERIC = {
+    "id": "id",
+    "created_at": "created_at",
+    "error": "status != 'ok'",
+    "traditional_ms": "traditional_ms",
+    "parlant_ms": "parlant_ms",
+    "total_ms": "total_ms",
+    "traditional_chars": "traditional_chars",
+    "parlant_chars": "parlant_chars",
+    "prompt_tokens": "prompt_tokens",
+    "completion_tokens": "completion_tokens",
+    "cost": "cost",
+    "parlant_leg": "parlant_leg",
+}
+_CODED = {
+    "model": "coalesce(model, '')",
+    "prompt_hash": "coalesce(prompt_hash, '')",
+    "source": "source",
+    "tools": "tools",
+}
+
+
+def parse_window(window: str) -> int:
+    """Convert ``"15m"``, ``"1h"`` or ``"7d"`` into seconds."""
+    match = _WINDOW.match(window.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid window {window!r}; use e.g. 15m, 1h or 1d")
+    return int(match.group(1)) * _WINDOW_SECONDS[match.group(2)]
+
+
+class HistoryColumns:
+    """Incrementally refreshed columnar copy of ``comparison_stats``."""
+
+    def __init__(self, path: str, batch_size: int = 50000):
+        self.path = path
+        self.batch_size = batch_size
+        self.columns: dict[str, np.ndarray] = {name: np.array([], dtype=float) for name in _NUMERIC}
+        self.columns.update({name: np.array([], dtype=np.int64) for name in _CODED})
+        # Distinct strings per coded column; a row's code indexes into this list
+        self.vocab: dict[str, list[str]] = {name: [] for name in _CODED}
+        self._codes: dict[str, dict[str, int]] = {name: {} for name in _CODED}
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        """Append rows written since the last refresh; returns how many were added."""
+        names = list(_NUMERIC) + list(_CODED)
+        sql = (
+            f"SELECT {', '.join(list(_NUMERIC.values()) + list(_CODED.values()))} "
+            "FROM comparison_stats WHERE id > ? ORDER BY id"
+        )
+        batches: dict[str, list[np.ndarray]] = {name: [] for name in names}
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            cursor = conn.execute(sql, (self._last_id,))
+            while rows := cursor.fetchmany(self.batch_size):
+                for name, values in zip(names, zip(*rows)):
+                    if name in _NUMERIC:
+                        # NULLs become NaN
+                        batches[name].append(np.array(values, dtype=float))
+                    else:
+                        batches[name].append(self._encode(name, np.array(values, dtype=object)))
+        finally:
+            conn.close()
+
+        added = sum(len(part) for part in batches["id"])
+        if added:
+            for name, parts in batches.items():
+                self.columns[name] = np.concatenate([self.columns[name], *parts])
+            self._last_id = int(self.columns["id"][-1])
+        return added
+
+    def _encode(self, name: str, values: np.ndarray) -> np.ndarray:
+        distinct, inverse = np.unique(values.astype(str), return_inverse=True)
+        codes = self._codes[name]
+        for value in distinct:
+            if value not in codes:
+                codes[value] = len(self.vocab[name])
+                self.vocab[name].append(value)
+        return np.array([codes[value] for value in distinct], dtype=np.int64)[inverse]
+
+    def select(
+        self,
+        model: Optional[str] = None,
+        prompt_hash: Optional[str] = None,
+        source: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> dict[str, np.ndarray]:
+        """Refresh, then return the columns restricted to matching rows."""
+        with self._lock:
+            self.refresh()
+            columns = dict(self.columns)
+        mask = np.ones(columns["id"].size, dtype=bool)
+        for name, value in (("model", model), ("prompt_hash", prompt_hash), ("source", source)):
+            if value:
+                code = self._codes[name].get(value, -1)
+                mask &= columns[name] == code
+        if since is not None:
+            mask &= columns["created_at"] >= since
+        if until is not None:
+            mask &= columns["created_at"] < until
+        return {name: values[mask] for name, values in columns.items()}
+
+    def report(self, group_by: str = "model", window: str = "1d", **filters) -> dict:
+        """Summarize matching rows per model, prompt hash or time window (or overall with ``"none"``)."""
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+        seconds = parse_window(window) if group_by == "window" else None
+        columns = self.select(**filters)
+        created_at = columns["created_at"]
+        if group_by == "none":
+            keys = np.zeros(created_at.size, dtype=np.int64)
+        elif group_by == "window":
+            keys = (created_at // seconds).astype(np.int64)
+        else:
+            keys = columns[group_by]
+
+        labels, inverse = np.unique(keys, return_inverse=True)
+        # Sort once by group so each group is a contiguous slice of row indexes
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(labels.size + 1))
+
+        groups = []
+        for position, label in enumerate(labels):
+            index = order[bounds[position]:bounds[position + 1]]
+            if group_by == "window":
+                key = {"window_start": datetime.fromtimestamp(int(label) * seconds, timezone.utc).isoformat()}
+            elif group_by == "none":
+                key = {}
+            else:
+                key = {group_by: self.vocab[group_by][label]}
+            groups.append({**key, **self._summarize(columns, index)})
+
+        return {
+            "group_by": group_by,
+            "window": window if group_by == "window" else None,
+            "total": int(created_at.size),
+            "groups": groups,
+        }
+
+    def _summarize(self, columns: dict[str, np.ndarray], index: np.ndarray) -> dict:
+        # Rows that carry their comparison's Parlant run
+        parlant_index = index[columns["parlant_leg"][index] == 1]
+        tools = columns["tools"][parlant_index]
+        no_tools = self._codes["tools"].get("", -1)
+        return {
+            "count": int(index.size),
+            "error_rate": round(float(columns["error"][index].mean()), 4) if index.size else 0.0,
+            "latency_ms": {
+                "traditional": _percentiles(columns["traditional_ms"][index]),
+                "parlant": _percentiles(columns["parlant_ms"][parlant_index]),
+                "total": _percentiles(columns["total_ms"][parlant_index]),
+            },
+            "reply_chars": {
+                "traditional": _length_distribution(columns["traditional_chars"][index]),
+                "parlant": _length_distribution(columns["parlant_chars"][parlant_index]),
+            },
+            "tool_usage_rate": round(float((tools != no_tools).mean()), 4) if parlant_index.size else 0.0,
+            "tools": self._tool_counts(tools),
+            "tokens": {
+                "prompt": int(np.nansum(columns["prompt_tokens"][index])),
+                "completion": int(np.nansum(columns["completion_tokens"][index])),
+                "cost": round(float(np.nansum(columns["cost"][index])), 6),
+            },
+        }
+
+    def _tool_counts(self, tools: np.ndarray) -> dict:
+        """Count how many comparisons used each tool, splitting each distinct tool list once."""
+        counts = np.bincount(tools, minlength=len(self.vocab["tools"]))
+        totals: dict[str, int] = {}
+        for code in np.flatnonzero(counts):
+            for tool in filter(None, (t.strip() for t in self.vocab["tools"][code].split(","))):
+                totals[tool] = totals.get(tool, 0) + int(counts[code])
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def _percentiles(values: np.ndarray) -> dict:
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {f"p{q}": None for q in PERCENTILES} | {"mean": None}
+    points = np.percentile(values, PERCENTILES)
+    return {f"p{q}": round(float(v), 1) for q, v in zip(PERCENTILES, points)} | {"mean": round(float(values.mean()), 1)}
+
+
+def _length_distribution(lengths: np.ndarray) -> dict:
+    lengths = lengths[~np.isnan(lengths)]
+    edges = np.array(REPLY_LENGTH_EDGES + (np.inf,))
+    counts, _ = np.histogram(lengths, bins=edges)
+    labels = [f"{int(lo)}-{int(hi)}" for lo, hi in zip(edges[:-2], edges[1:-1])] + [f"{REPLY_LENGTH_EDGES[-1]}+"]
+    return {**_percentiles(lengths), "histogram": dict(zip(labels, counts.tolist()))}
@@ -1,19 +1,54 @@
 """FastAPI server to expose backend functionality for frontend."""
 import asyncio
+import json
 import pathlib
 import logging
-from fastapi import FastAPI, HTTPException
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
-from config import API_PORT, API_HOST, FRONTEND_PORT, FRONTEND_URL, DEMO_QUERIES, CORS_ORIGINS
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, Awaitable, Callable, Literal, Optional
+from config import (
+    API_PORT, API_HOST, FRONTEND_PORT, FRONTEND_URL, DEMO_QUERIES, CORS_ORIGINS, COMPARE_MODE,
+    PARLANT_SESSION_POOL_SIZE, PARLANT_SESSION_MAX_AGE, PARLANT_REPLY_TIMEOUT,
+    OPENROUTER_MODEL, COMPARE_CACHE_SIZE, COMPARE_CACHE_TTL, COMPARE_MAX_MODELS, COMPARE_ALLOWED_MODELS,
+    BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_MAX_QUERIES, PARLANT_AGENT_ID,
+    LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATES, PROMPT_MODE, PROMPT_TOP_K,
+    RESULT_STORE_PATH, RESULT_STORE_BATCH_SIZE,
+    COMPARE_MAX_IN_FLIGHT, COMPARE_MAX_QUEUE, COMPARE_QUEUE_TIMEOUT, COMPARE_BACKGROUND_MAX_IN_FLIGHT,
+    JOB_STORE_PATH, JOB_WORKERS, JOB_MAX_PENDING, JOB_RETENTION, JOB_MAX_ATTEMPTS,
+    PARLANT_BASE_URL, SHUTDOWN_DRAIN_TIMEOUT, API_WORKERS, API_RELOAD, SHARED_STATE_PATH,
 )
-from traditional_llm_prompt import call_traditional_llm, TRADITIONAL_HUGE_PROMPT
+from logging_setup import setup_logging, parse_sample_rates
+
+# Configure logging: records go through a queue to a background writer thread
+setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, sample_rates=parse_sample_rates(LOG_SAMPLE_RATES))
+logger = logging.getLogger("api_server")
+from traditional_llm_prompt import (
+    call_traditional_llm_with_usage,
+    start_traditional_result,
+    stream_traditional_llm,
+    TraditionalLLMResult,
+    TRADITIONAL_HUGE_PROMPT,
+    PROMPT_FINGERPRINT,
+    openrouter_breaker,
+    model_breakers,
+    hedge_delay,
+    openai_client,
+    openrouter_http_client,
+    OPENROUTER_BASE_URL,
+)
+from prompt_selection import PromptSelector
+from comparison_cache import ComparisonCache, SharedComparisonCache, SingleFlight
+from admission import AdmissionController, Overloaded
+from jobs import JobRunner, JobStore
+from result_store import ResultStore
+from http_pools import PARLANT_TIMEOUT, parlant_http_client, warm_up
+from analytics import GROUP_BY, HistoryColumns
+from metrics import REGISTRY, SharedMetrics, STAGE_LATENCY, COMPARE_LATENCY, IN_FLIGHT, UPSTREAM_ERRORS, PROMPT_TOKENS_SAVED
 import sys
 import pathlib
 
@@ -27,21 +62,66 @@ from parlant_client_utils import (
     send_user_message as send_parlant_user_message,
     await_ai_reply as await_parlant_ai_reply,
     get_session_reasoning as get_parlant_reasoning,
+    SessionPool,
+    SessionEventCollector,
+    Event as ParlantEvent,
 )
 
-app = FastAPI(title="Parlant Comparison API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the upstream clients once at startup and drain and close them on shutdown."""
+    try:
+        await initialize_parlant()
+    except Exception:
+        # Already logged; requests retry the initialization until Parlant is up
+        pass
+    await asyncio.gather(
+        warm_up(openrouter_http_client, OPENROUTER_BASE_URL),
+        warm_up(parlant_http, PARLANT_BASE_URL) if parlant_http is not None else asyncio.sleep(0),
+    )
+    if job_runner is not None:
+        await job_runner.start()
+    publisher = asyncio.create_task(publish_metrics()) if shared_metrics is not None else None
+    logger.info("Upstream clients ready", extra={"category": "startup"})
+
+    yield
+
+    # Uvicorn has stopped accepting requests; let running work finish before closing its connections
+    started = time.perf_counter()
+    if job_runner is not None:
+        await job_runner.stop(timeout=SHUTDOWN_DRAIN_TIMEOUT)
+    remaining = max(0.0, SHUTDOWN_DRAIN_TIMEOUT - (time.perf_counter() - started))
+    if not await admission.drain(remaining):
+        logger.warning(
+            f"Closing upstream connections with {admission.in_flight} comparisons still running",
+            extra={"category": "shutdown"},
+        )
+    if session_pool is not None:
+        # Deletes pre-warmed sessions that were never used
+        await session_pool.close()
+    await openai_client.close()
+    if parlant_http is not None:
+        await parlant_http.aclose()
+    if result_store is not None:
+        # Writes any queued comparison results
+        await result_store.close()
+    if isinstance(comparison_cache, SharedComparisonCache):
+        comparison_cache.close()
+    if publisher is not None:
+        publisher.cancel()
+
+
+app = FastAPI(title="Parlant Comparison API", version="1.0.0", lifespan=lifespan)
 
 # Global exception handler for unhandled exceptions
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    import logging
-    
     # Log validation error for debugging
-    logging.warning(f"Validation error: {str(exc)}")
-    print(f"⚠️ Validation error: {str(exc)}")
+    logger.warning("Validation error", extra={"category": "validation", "path": str(request.url.path), "error_message": str(exc)})
     
     # Return friendly message to user
     return JSONResponse(
@@ -57,19 +137,12 @@ async def validation_exception_handler(request, exc):
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    import traceback
-    import logging
-    
     # Log detailed error for debugging
-    error_details = {
-        "error_type": type(exc).__name__,
-        "error_message": str(exc),
-        "path": str(request.url.path),
-        "traceback": traceback.format_exc()
-    }
-    logging.error(f"Unhandled exception: {error_details}")
-    print(f"❌ Unhandled exception: {error_details}")
-    print(traceback.format_exc())
+    logger.error(
+        "Unhandled exception",
+        exc_info=exc,
+        extra={"category": "error", "path": str(request.url.path), "error_type": type(exc).__name__, "error_message": str(exc)},
+    )
     
     # Return friendly message to user
     return JSONResponse(
@@ -103,7 +176,7 @@ cors_config = {
 # Add regex pattern if configured (optional)
 if cors_regex:
     cors_config["allow_origin_regex"] = cors_regex
-    print(f"🔒 CORS regex pattern enabled: {cors_regex}")
+    logger.info("CORS regex pattern enabled", extra={"category": "startup", "cors_regex": cors_regex})
 
 app.add_middleware(
     CORSMiddleware,
@@ -111,28 +184,57 @@ app.add_middleware(
 )
 
 # Log CORS configuration on startup
-print(f"🔒 CORS enabled for origins: {CORS_ORIGINS}")
+logger.info("CORS enabled", extra={"category": "startup", "cors_origins": CORS_ORIGINS})
 
-# Add middleware to log CORS requests for debugging
+# Add middleware to log CORS requests for debugging (sampled via LOG_SAMPLE_RATES "cors")
 @app.middleware("http")
 async def log_cors_requests(request, call_next):
-    import logging
-    origin = request.headers.get("origin")
-    if origin:
-        logging.info(f"🌐 Request from origin: {origin}")
-        print(f"🌐 Request from origin: {origin}")
     response = await call_next(request)
-    # Log CORS headers in response
+    origin = request.headers.get("origin")
     if origin:
-        cors_header = response.headers.get("access-control-allow-origin")
-        if cors_header:
-            logging.info(f"✅ CORS allowed for origin: {origin}")
-            print(f"✅ CORS allowed for origin: {origin}")
+        logger.info(
+            "CORS request",
+            extra={
+                "category": "cors",
+                "origin": origin,
+                "path": request.url.path,
+                "allowed": "access-control-allow-origin" in response.headers,
+            },
+        )
     return response
 
-# Global variables for Parlant client and agent ID
+# Global variables for Parlant client (and its connection pool), agent ID and pre-warmed session pool
+parlant_http = None
 parlant_client = None
 agent_id = None
+session_pool = None
+
+# Comparison result cache keyed by normalized query, model and prompt fingerprint;
+# with SHARED_STATE_PATH set, every worker process reads and fills the same cache
+if SHARED_STATE_PATH:
+    comparison_cache = SharedComparisonCache(
+        SHARED_STATE_PATH,
+        max_entries=COMPARE_CACHE_SIZE,
+        ttl=COMPARE_CACHE_TTL,
+        dumps=lambda comparison: comparison.model_dump_json(),
+        loads=lambda text: CompareData.model_validate_json(text),
+    )
+else:
+    comparison_cache = ComparisonCache(max_entries=COMPARE_CACHE_SIZE, ttl=COMPARE_CACHE_TTL)
+# Per-worker metrics are summed across processes for /metrics
+shared_metrics = SharedMetrics(SHARED_STATE_PATH, REGISTRY) if SHARED_STATE_PATH else None
+# Identical comparisons that arrive while one is running share its result
+comparison_flights = SingleFlight()
+# Bounds how many fresh comparisons run at once and how many may wait for a slot
+admission = AdmissionController(
+    COMPARE_MAX_IN_FLIGHT, COMPARE_MAX_QUEUE, COMPARE_QUEUE_TIMEOUT, max_background=COMPARE_BACKGROUND_MAX_IN_FLIGHT
+)
+# Section index used when the traditional prompt is trimmed per query
+prompt_selector = PromptSelector(TRADITIONAL_HUGE_PROMPT, top_k=PROMPT_TOP_K)
+# Every fresh comparison is written here in the background for the history API
+result_store = ResultStore(RESULT_STORE_PATH, batch_size=RESULT_STORE_BATCH_SIZE) if RESULT_STORE_PATH else None
+# In-memory columns of the history, extended with new rows on each analytics request
+history_columns = HistoryColumns(RESULT_STORE_PATH) if result_store is not None else None
 
 
 # Standard Response Model
@@ -146,19 +248,76 @@ class StandardResponse(BaseModel):
 # Pydantic models for request/response
 class CompareRequest(BaseModel):
     query: str
+    concurrent: Optional[bool] = None
+    bypass_cache: bool = False
+    prompt_mode: Optional[Literal["full", "selective"]] = None
+    # OpenRouter models to run the traditional leg against instead of OPENROUTER_MODEL
+    models: Optional[list[str]] = None
+
+
+class BatchCompareRequest(BaseModel):
+    queries: list[str]
+    concurrency: Optional[int] = None
+    concurrent: Optional[bool] = None
+    bypass_cache: bool = False
+    prompt_mode: Optional[Literal["full", "selective"]] = None
+
+
+class CompareTimings(BaseModel):
+    mode: str
+    traditional_ms: float
+    parlant_ms: float
+    total_ms: float
+
+
+class PromptInfo(BaseModel):
+    mode: str
+    fingerprint: Optional[str] = None
+    sections: list[str] = []
+    prompt_tokens: int
+    tokens_saved: int = 0
+
+
+class TokenUsage(BaseModel):
+    model: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    cost: Optional[float] = None
+    estimated_prompt_tokens: int
+    estimated_query_tokens: int
+
+
+class ModelResult(BaseModel):
+    model: str
+    response: str
+    error: Optional[str] = None
+    latency_ms: float
+    usage: TokenUsage
 
 
 class CompareData(BaseModel):
     query: str
     traditional_response: str
+    # Set when the traditional leg failed: missing_api_key, circuit_open, deadline_exceeded or upstream_error
+    traditional_error: Optional[str] = None
     parlant_response: str
     reasoning: str
+    timings: Optional[CompareTimings] = None
+    prompt: Optional[PromptInfo] = None
+    usage: Optional[TokenUsage] = None
+    # One entry per requested model; the traditional_* fields and usage mirror the first
+    models: Optional[list[ModelResult]] = None
+    cached: bool = False
 
 
 class HealthData(BaseModel):
     initialized: bool
     parlant_ready: bool
     error: Optional[str] = None
+    openrouter: Optional[dict] = None
+    admission: Optional[dict] = None
+    jobs: Optional[dict] = None
 
 
 class DemoQueriesData(BaseModel):
@@ -166,31 +325,43 @@ class DemoQueriesData(BaseModel):
 
 
 async def initialize_parlant():
-    """Initialize Parlant client and load agent ID."""
-    global parlant_client, agent_id
+    """Initialize Parlant client, load agent ID and start the session pool."""
+    global parlant_http, parlant_client, agent_id, session_pool
     
     try:
         if parlant_client is None:
-            parlant_client = await create_parlant_client()
+            parlant_http = parlant_http_client()
+            parlant_client = await create_parlant_client(httpx_client=parlant_http, timeout=PARLANT_TIMEOUT)
+        
+        if agent_id is None and PARLANT_AGENT_ID:
+            agent_id = PARLANT_AGENT_ID
         
         if agent_id is None:
             # parlant-data is now in parlant/ directory (root level)
             parlant_dir = pathlib.Path(__file__).parent.parent / "parlant"
             agent_id_path = parlant_dir / "parlant-data" / "agent_id.txt"
             if not agent_id_path.exists():
-                import logging
-                logging.error(f"agent_id.txt not found at {agent_id_path}. Parlant server may not be running.")
+                logger.error("agent_id.txt not found. Parlant server may not be running.", extra={"category": "parlant", "path": str(agent_id_path)})
                 raise RuntimeError("Parlant agent server is not initialized. Please start the Parlant agent server first.")
             with open(agent_id_path, "r", encoding="utf-8") as f:
                 agent_id = f.read().strip()
         
+        if session_pool is None:
+            session_pool = SessionPool(
+                parlant_client,
+                agent_id,
+                size=PARLANT_SESSION_POOL_SIZE,
+                max_age=PARLANT_SESSION_MAX_AGE,
+            )
+            session_pool.start()
+        
         return parlant_client, agent_id
     except Exception as e:
-        import logging
-        import traceback
-        logging.error(f"Failed to initialize Parlant: {type(e).__name__}: {str(e)}\n{traceback.format_exc()}")
-        print(f"❌ Failed to initialize Parlant: {type(e).__name__}: {str(e)}")
-        print(traceback.format_exc())
+        logger.error(
+            "Failed to initialize Parlant",
+            exc_info=True,
+            extra={"category": "parlant", "error_type": type(e).__name__, "error_message": str(e)},
+        )
         raise
 
 
@@ -224,18 +395,12 @@ async def initialize_assistant():
             }
         )
     except Exception as e:
-        import traceback
-        import logging
-        
         # Log detailed error for debugging
-        error_details = {
-            "error_type": type(e).__name__,
-            "error_message": str(e),
-            "traceback": traceback.format_exc()
-        }
-        logging.error(f"Failed to initialize assistant: {error_details}")
-        print(f"❌ Failed to initialize assistant: {error_details}")
-        print(traceback.format_exc())
+        logger.error(
+            "Failed to initialize assistant",
+            exc_info=True,
+            extra={"category": "error", "error_type": type(e).__name__, "error_message": str(e)},
+        )
         
         # Return friendly message to user
         return StandardResponse(
@@ -251,46 +416,346 @@ async def initialize_assistant():
         )
 
 
-async def process_comparison(query: str) -> CompareData:
-    """Process a single query comparison."""
+def build_traditional_prompt(query: str, prompt_mode: str) -> tuple[str, PromptInfo]:
+    """Return the system prompt for a query and a summary of what it contains."""
+    if prompt_mode == "selective":
+        selected = prompt_selector.select(query)
+        PROMPT_TOKENS_SAVED.inc(selected.tokens_saved)
+        return selected.text, PromptInfo(
+            mode="selective",
+            sections=selected.sections,
+            prompt_tokens=selected.prompt_tokens,
+            tokens_saved=selected.tokens_saved,
+        )
+    return TRADITIONAL_HUGE_PROMPT, PromptInfo(mode="full", prompt_tokens=prompt_selector.full_prompt_tokens)
+
+
+async def run_traditional_models(query: str, prompt_mode: str, models: list[str]) -> tuple[list[ModelResult], float, PromptInfo]:
+    """Call every model concurrently with one shared prompt; return their results, the leg's duration in ms and the prompt summary."""
+    started = time.perf_counter()
+    prompt, prompt_info = build_traditional_prompt(query, prompt_mode)
+    
+    async def run_model(model: str) -> ModelResult:
+        model_started = time.perf_counter()
+        result = await call_traditional_llm_with_usage(query, prompt, model)
+        elapsed = time.perf_counter() - model_started
+        STAGE_LATENCY.observe(elapsed, stage="traditional_llm")
+        return ModelResult(
+            model=result.model,
+            response=result.text,
+            error=result.error,
+            latency_ms=round(elapsed * 1000, 1),
+            usage=token_usage(result, prompt_info),
+        )
+    
+    results = await asyncio.gather(*(run_model(model) for model in models))
+    return list(results), (time.perf_counter() - started) * 1000, prompt_info
+
+
+def normalize_models(models: Optional[list[str]]) -> Optional[list[str]]:
+    """Strip and de-duplicate requested models, keeping their order; None when none were given."""
+    normalized = list(dict.fromkeys(model.strip() for model in models or [] if model.strip()))
+    return normalized or None
+
+
+def invalid_models_response(models: Optional[list[str]], path: str) -> Optional[StandardResponse]:
+    """400 response for too many models or models outside ``COMPARE_ALLOWED_MODELS``, else None."""
+    if models is None:
+        return None
+    if len(models) > COMPARE_MAX_MODELS:
+        return StandardResponse(
+            status_code=400,
+            status=False,
+            message=f"Please choose at most {COMPARE_MAX_MODELS} models.",
+            path=path,
+            data={}
+        )
+    not_allowed = [model for model in models if model not in COMPARE_ALLOWED_MODELS]
+    if not_allowed:
+        return StandardResponse(
+            status_code=400,
+            status=False,
+            message=f"Model not available for comparisons: {', '.join(not_allowed)}",
+            path=path,
+            data={"allowed_models": COMPARE_ALLOWED_MODELS}
+        )
+    return None
+
+
+def token_usage(result: TraditionalLLMResult, prompt_info: PromptInfo) -> TokenUsage:
+    """Record the prompt fingerprint on ``prompt_info`` and return the call's token usage."""
+    prompt_info.fingerprint = result.prompt_fingerprint
+    usage = result.usage()
+    del usage["prompt_fingerprint"]
+    return TokenUsage(**usage)
+
+
+class TraditionalStream:
+    """One streamed traditional LLM call, keeping what ``CompareData`` needs once it ends."""
+
+    def __init__(self, query: str, prompt_mode: str):
+        self.query = query
+        self.prompt, self.prompt_info = build_traditional_prompt(query, prompt_mode)
+        self.result = start_traditional_result(query, self.prompt)
+        self.first_token_ms: Optional[float] = None
+        self.elapsed_ms = 0.0
+        self.usage: Optional[TokenUsage] = None
+
+    async def tokens(self) -> AsyncIterator[str]:
+        """Yield text deltas; timings and usage are filled in when the stream ends."""
+        started = time.perf_counter()
+        async for delta in stream_traditional_llm(self.query, self.prompt, self.result):
+            if self.first_token_ms is None:
+                self.first_token_ms = (time.perf_counter() - started) * 1000
+                STAGE_LATENCY.observe(self.first_token_ms / 1000, stage="traditional_first_token")
+            yield delta
+        self.elapsed_ms = (time.perf_counter() - started) * 1000
+        STAGE_LATENCY.observe(self.elapsed_ms / 1000, stage="traditional_llm")
+        self.usage = token_usage(self.result, self.prompt_info)
+
+    def summary(self) -> dict:
+        return {
+            "traditional_response": self.result.text,
+            "traditional_error": self.result.error,
+            "traditional_ms": round(self.elapsed_ms, 1),
+            "first_token_ms": round(self.first_token_ms, 1) if self.first_token_ms is not None else None,
+            "usage": self.usage.model_dump() if self.usage else None,
+        }
+
+
+async def run_parlant_leg(
+    client,
+    agent_id: str,
+    query: str,
+    on_event: Optional[Callable[[ParlantEvent], Awaitable[None]]] = None,
+) -> tuple[str, str, float]:
+    """Run the Parlant leg and return its response, reasoning and duration in ms.
+
+    ``on_event`` is called with each message, tool and status event of the
+    agent's turn as it arrives.
+    """
+    started = time.perf_counter()
+    try:
+        with STAGE_LATENCY.time(stage="session_create"):
+            if session_pool is not None:
+                session_id = await session_pool.acquire()
+            else:
+                session_id = await create_parlant_session(client, agent_id)
+        with STAGE_LATENCY.time(stage="send_message"):
+            customer_event_offset = await send_parlant_user_message(client, session_id, query)
+        min_offset = customer_event_offset + 1
+        collector = SessionEventCollector(client, session_id, min_offset)
+        with STAGE_LATENCY.time(stage="await_reply"):
+            parlant_response = await await_parlant_ai_reply(
+                client, session_id, min_offset, timeout=PARLANT_REPLY_TIMEOUT, collector=collector, on_event=on_event
+            ) or "Error: No AI reply received from Parlant session."
+        with STAGE_LATENCY.time(stage="reasoning"):
+            reasoning = await get_parlant_reasoning(client, session_id, min_offset, collector=collector)
+    except Exception as e:
+        if not isinstance(e, asyncio.CancelledError):
+            UPSTREAM_ERRORS.inc(upstream="parlant", error_type=type(e).__name__)
+        raise
+    return parlant_response, reasoning, (time.perf_counter() - started) * 1000
+
+
+async def process_comparison(
+    query: str,
+    concurrent: Optional[bool] = None,
+    prompt_mode: Optional[str] = None,
+    models: Optional[list[str]] = None,
+) -> CompareData:
+    """Process a single query comparison.
+
+    In concurrent mode both legs run at the same time; if either leg raises,
+    the task group cancels the other before the error propagates. With
+    ``models`` the traditional leg calls each of them concurrently and the
+    result lists them under ``models``.
+    """
+    if concurrent is None:
+        concurrent = COMPARE_MODE == "concurrent"
+    prompt_mode = prompt_mode or PROMPT_MODE
     try:
         client, agent_id = await initialize_parlant()
+        started = time.perf_counter()
         
-        # Get traditional LLM response
-        traditional_response = await call_traditional_llm(query, TRADITIONAL_HUGE_PROMPT)
-        
-        # Get Parlant agent response
-        session_id = await create_parlant_session(client, agent_id)
-        customer_event_offset = await send_parlant_user_message(client, session_id, query)
-        min_offset = customer_event_offset + 1
-        parlant_response = await await_parlant_ai_reply(client, session_id, min_offset) or "Error: No AI reply received from Parlant session."
-        reasoning = await get_parlant_reasoning(client, session_id, min_offset)
+        if concurrent:
+            async with asyncio.TaskGroup() as tg:
+                traditional_task = tg.create_task(run_traditional_models(query, prompt_mode, models or [OPENROUTER_MODEL]))
+                parlant_task = tg.create_task(run_parlant_leg(client, agent_id, query))
+            model_results, traditional_ms, prompt_info = traditional_task.result()
+            parlant_response, reasoning, parlant_ms = parlant_task.result()
+        else:
+            model_results, traditional_ms, prompt_info = await run_traditional_models(query, prompt_mode, models or [OPENROUTER_MODEL])
+            parlant_response, reasoning, parlant_ms = await run_parlant_leg(client, agent_id, query)
         
-        return CompareData(
+        first = model_results[0]
+        comparison = CompareData(
             query=query,
-            traditional_response=traditional_response,
+            traditional_response=first.response,
+            traditional_error=first.error,
             parlant_response=parlant_response,
-            reasoning=reasoning
+            reasoning=reasoning,
+            timings=CompareTimings(
+                mode="concurrent" if concurrent else "sequential",
+                traditional_ms=round(traditional_ms, 1),
+                parlant_ms=round(parlant_ms, 1),
+                total_ms=round((time.perf_counter() - started) * 1000, 1),
+            ),
+            prompt=prompt_info,
+            usage=first.usage,
+            models=model_results if models else None,
         )
+        save_comparison(comparison)
+        return comparison
     except Exception as e:
-        import traceback
-        import logging
+        # A failed leg inside the task group surfaces as an ExceptionGroup
+        if isinstance(e, ExceptionGroup):
+            e = e.exceptions[0]
         
         # Log detailed error for debugging
-        error_details = {
-            "error_type": type(e).__name__,
-            "error_message": str(e),
-            "traceback": traceback.format_exc()
-        }
-        logging.error(f"Error processing comparison: {error_details}")
-        print(f"❌ Error processing comparison: {error_details}")
-        print(traceback.format_exc())
+        logger.error(
+            "Error processing comparison",
+            exc_info=e,
+            extra={"category": "error", "error_type": type(e).__name__, "error_message": str(e)},
+        )
         
         # Return friendly message to user
         friendly_message = "Unable to process your query at this time. Please try again or contact support if the issue persists."
         raise HTTPException(status_code=500, detail=friendly_message)
 
 
+def save_comparison(comparison: CompareData, source: str = "api") -> None:
+    """Queue a freshly computed comparison for the result store; multi-model runs store one row per model."""
+    if result_store is None:
+        return
+    if not comparison.models:
+        record_history(comparison, comparison.traditional_response, comparison.traditional_error, source=source)
+        return
+    # The Parlant run is shared, so only the first model's row counts it (and its failure)
+    for position, result in enumerate(comparison.models):
+        record_history(
+            comparison,
+            result.response,
+            result.error,
+            source=source,
+            traditional_ms=result.latency_ms,
+            usage=result.usage,
+            parlant_leg=position == 0,
+        )
+
+
+def record_history(
+    comparison: CompareData,
+    traditional_response: str,
+    traditional_error: Optional[str],
+    *,
+    source: str,
+    traditional_ms: Optional[float] = None,
+    usage: Optional[TokenUsage] = None,
+    parlant_leg: bool = True,
+) -> None:
+    failed = traditional_error is not None or (parlant_leg and comparison.parlant_response.startswith("Error"))
+    timings = comparison.timings
+    usage = usage or comparison.usage
+    result_store.record(
+        comparison.query,
+        traditional_response,
+        comparison.parlant_response,
+        comparison.reasoning,
+        source=source,
+        status="error" if failed else "ok",
+        traditional_ms=traditional_ms if traditional_ms is not None else timings.traditional_ms if timings else None,
+        parlant_ms=timings.parlant_ms if timings else None,
+        total_ms=timings.total_ms if timings else None,
+        usage=usage.model_dump() if usage else None,
+        prompt_hash=comparison.prompt.fingerprint if comparison.prompt else None,
+        prompt_mode=comparison.prompt.mode if comparison.prompt else None,
+        parlant_leg=parlant_leg,
+    )
+
+
+def is_cacheable(result: CompareData) -> bool:
+    """Only cache comparisons where no leg (and no requested model) failed."""
+    return not (
+        result.traditional_error is not None
+        or result.parlant_response.startswith("Error")
+        or any(model.error is not None for model in result.models or [])
+    )
+
+
+def canonical_models(models: Optional[list[str]]) -> Optional[list[str]]:
+    """Sorted, de-duplicated model list; None when it is just ``OPENROUTER_MODEL``.
+
+    Requests that name the same models in any order, or only the default model,
+    then share a cache entry and an in-flight run.
+    """
+    models = sorted(set(models or [OPENROUTER_MODEL]))
+    return None if models == [OPENROUTER_MODEL] else models
+
+
+def comparison_cache_key(query: str, prompt_mode: str, models: Optional[list[str]] = None) -> str:
+    # Selective prompts are a deterministic function of the query, so the mode completes the key
+    models = canonical_models(models)
+    model = "models:" + ",".join(models) if models else OPENROUTER_MODEL
+    return comparison_cache.make_key(query, model, f"{PROMPT_FINGERPRINT}:{prompt_mode}")
+
+
+async def get_comparison(
+    query: str,
+    concurrent: Optional[bool] = None,
+    bypass_cache: bool = False,
+    prompt_mode: Optional[str] = None,
+    patient: bool = False,
+    models: Optional[list[str]] = None,
+) -> CompareData:
+    """Return a comparison from the cache, an identical in-flight run, or a fresh run.
+
+    Fresh runs need an admission slot and raise ``Overloaded`` when none is
+    available; ``patient`` callers wait for one instead (see ``AdmissionController.slot``).
+    A shared run takes its slot with the patience of the caller that started
+    it, so a patient caller whose shared run was rejected starts its own.
+    """
+    prompt_mode = prompt_mode or PROMPT_MODE
+    models = canonical_models(models)
+    cache_key = comparison_cache_key(query, prompt_mode, models)
+    result = None if bypass_cache else await comparison_cache.aget(cache_key)
+    if result is not None:
+        return result.model_copy(update={"cached": True, "query": query})
+    
+    async def run_comparison() -> CompareData:
+        async with admission.slot(patient=patient):
+            comparison = await process_comparison(query, concurrent=concurrent, prompt_mode=prompt_mode, models=models)
+        if is_cacheable(comparison):
+            comparison_cache.set(cache_key, comparison)
+        return comparison
+    
+    while True:
+        try:
+            result = await comparison_flights.do(cache_key, run_comparison)
+            break
+        except Overloaded:
+            if not patient:
+                raise
+    if result.query != query:
+        result = result.model_copy(update={"query": query})
+    return result
+
+
+def overloaded_response(e: Overloaded, path: str) -> JSONResponse:
+    """429/503 response with a Retry-After header for a comparison that was not admitted."""
+    return JSONResponse(
+        status_code=e.status_code,
+        headers={"Retry-After": str(e.retry_after)},
+        content={
+            "status_code": e.status_code,
+            "status": False,
+            "message": str(e),
+            "path": path,
+            "data": {"reason": e.reason, "retry_after": e.retry_after}
+        }
+    )
+
+
 @app.post("/api/compare", response_model=StandardResponse)
 async def compare_responses(request: CompareRequest):
     """Compare Traditional LLM vs Parlant agent responses for a given query."""
@@ -305,8 +770,29 @@ async def compare_responses(request: CompareRequest):
                 path="/api/compare",
                 data={}
             )
+        models = normalize_models(request.models)
+        invalid = invalid_models_response(models, "/api/compare")
+        if invalid is not None:
+            return invalid
         
-        result = await process_comparison(query)
+        started = time.perf_counter()
+        outcome = "error"
+        IN_FLIGHT.inc()
+        try:
+            result = await get_comparison(
+                query,
+                concurrent=request.concurrent,
+                bypass_cache=request.bypass_cache,
+                prompt_mode=request.prompt_mode,
+                models=models,
+            )
+            outcome = "cached" if result.cached else "ok"
+        except Overloaded:
+            outcome = "rejected"
+            raise
+        finally:
+            IN_FLIGHT.dec()
+            COMPARE_LATENCY.observe(time.perf_counter() - started, outcome=outcome)
         
         return StandardResponse(
             status_code=200,
@@ -315,6 +801,8 @@ async def compare_responses(request: CompareRequest):
             path="/api/compare",
             data=result.model_dump()
         )
+    except Overloaded as e:
+        return overloaded_response(e, "/api/compare")
     except HTTPException as e:
         return StandardResponse(
             status_code=e.status_code,
@@ -324,10 +812,12 @@ async def compare_responses(request: CompareRequest):
             data={}
         )
     except Exception as e:
-        import traceback
         error_details = str(e)
-        print(f"Error in compare_responses endpoint: {error_details}")
-        print(traceback.format_exc())
+        logger.error(
+            "Error in compare_responses endpoint",
+            exc_info=True,
+            extra={"category": "error", "error_type": type(e).__name__, "error_message": error_details},
+        )
         return StandardResponse(
             status_code=500,
             status=False,
@@ -337,6 +827,625 @@ async def compare_responses(request: CompareRequest):
         )
 
 
+def streamed_comparison(
+    query: str,
+    concurrent: bool,
+    traditional: TraditionalStream,
+    parlant_response: str,
+    reasoning: str,
+    parlant_ms: float,
+    started: float,
+) -> CompareData:
+    """Assemble ``CompareData`` from a finished traditional stream and Parlant leg."""
+    return CompareData(
+        query=query,
+        traditional_response=traditional.result.text,
+        traditional_error=traditional.result.error,
+        parlant_response=parlant_response,
+        reasoning=reasoning,
+        timings=CompareTimings(
+            mode="concurrent" if concurrent else "sequential",
+            traditional_ms=round(traditional.elapsed_ms, 1),
+            parlant_ms=round(parlant_ms, 1),
+            total_ms=round((time.perf_counter() - started) * 1000, 1),
+        ),
+        prompt=traditional.prompt_info,
+        usage=traditional.usage,
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_comparison(
+    query: str,
+    concurrent: Optional[bool] = None,
+    bypass_cache: bool = False,
+    prompt_mode: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Run a comparison, streaming traditional LLM tokens as server-sent events.
+
+    Emits ``token`` events with text deltas, a ``traditional_done`` event when
+    the traditional leg finishes, and a final ``result`` event with the usual
+    ``CompareData``, or an ``error`` event. Cache hits are sent as a single
+    ``result`` event.
+    """
+    if concurrent is None:
+        concurrent = COMPARE_MODE == "concurrent"
+    prompt_mode = prompt_mode or PROMPT_MODE
+    cache_key = comparison_cache_key(query, prompt_mode)
+    started = time.perf_counter()
+    outcome = "error"
+    parlant_task = None
+    IN_FLIGHT.inc()
+    try:
+        cached = None if bypass_cache else await comparison_cache.aget(cache_key)
+        if cached is not None:
+            outcome = "cached"
+            yield sse_event("result", cached.model_copy(update={"cached": True, "query": query}).model_dump())
+            return
+        
+        async with admission.slot():
+            client, agent_id = await initialize_parlant()
+            if concurrent:
+                parlant_task = asyncio.create_task(run_parlant_leg(client, agent_id, query))
+            
+            traditional = TraditionalStream(query, prompt_mode)
+            async for delta in traditional.tokens():
+                yield sse_event("token", {"text": delta})
+            yield sse_event("traditional_done", traditional.summary())
+            
+            if parlant_task is None:
+                parlant_task = asyncio.create_task(run_parlant_leg(client, agent_id, query))
+            parlant_response, reasoning, parlant_ms = await parlant_task
+        
+        comparison = streamed_comparison(query, concurrent, traditional, parlant_response, reasoning, parlant_ms, started)
+        save_comparison(comparison)
+        if is_cacheable(comparison):
+            comparison_cache.set(cache_key, comparison)
+        outcome = "ok"
+        yield sse_event("result", comparison.model_dump())
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client disconnected mid-stream
+        outcome = "cancelled"
+        raise
+    except Overloaded as e:
+        outcome = "rejected"
+        yield sse_event("error", {"message": str(e), "status_code": e.status_code, "retry_after": e.retry_after})
+    except Exception as e:
+        logger.error(
+            "Error streaming comparison",
+            exc_info=e,
+            extra={"category": "error", "error_type": type(e).__name__, "error_message": str(e)},
+        )
+        yield sse_event("error", {
+            "message": "Unable to process your query at this time. Please try again or contact support if the issue persists."
+        })
+    finally:
+        # The client may disconnect mid-stream; don't leave the Parlant leg running
+        if parlant_task is not None and not parlant_task.done():
+            parlant_task.cancel()
+        IN_FLIGHT.dec()
+        COMPARE_LATENCY.observe(time.perf_counter() - started, outcome=outcome)
+
+
+@app.post("/api/compare/stream")
+async def compare_stream(request: CompareRequest):
+    """Compare responses, streaming the traditional LLM's tokens over server-sent events."""
+    query = request.query.strip()
+    if not query:
+        return StandardResponse(
+            status_code=400,
+            status=False,
+            message="Please enter a query to compare.",
+            path="/api/compare/stream",
+            data={}
+        )
+    if normalize_models(request.models):
+        return StandardResponse(
+            status_code=400,
+            status=False,
+            message="Multi-model comparisons are not streamed; use /api/compare or /api/jobs.",
+            path="/api/compare/stream",
+            data={}
+        )
+    
+    # Unless the result is cached, reject an overloaded request before the stream starts so it gets a real 429
+    cache_key = comparison_cache_key(query, request.prompt_mode or PROMPT_MODE)
+    if request.bypass_cache or not await comparison_cache.acontains(cache_key):
+        try:
+            admission.check()
+        except Overloaded as e:
+            return overloaded_response(e, "/api/compare/stream")
+    
+    return StreamingResponse(
+        stream_comparison(query, concurrent=request.concurrent, bypass_cache=request.bypass_cache, prompt_mode=request.prompt_mode),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def parlant_event_frame(event: ParlantEvent) -> dict:
+    """Describe a Parlant session event as a WebSocket frame."""
+    data = event.data if isinstance(event.data, dict) else {}
+    frame = {"type": f"parlant_{event.kind}", "offset": event.offset, "source": event.source}
+    if event.kind == "message":
+        frame["message"] = data.get("message")
+    elif event.kind == "tool":
+        frame["tool_calls"] = data.get("tool_calls", [])
+    elif event.kind == "status":
+        frame["status"] = data.get("status")
+    return frame
+
+
+async def websocket_comparison(websocket: WebSocket, request: CompareRequest) -> None:
+    """Run one comparison, sending each leg's progress as frames as soon as it arrives."""
+    query = request.query.strip()
+    concurrent = request.concurrent if request.concurrent is not None else COMPARE_MODE == "concurrent"
+    prompt_mode = request.prompt_mode or PROMPT_MODE
+    cache_key = comparison_cache_key(query, prompt_mode)
+    started = time.perf_counter()
+    outcome = "error"
+    IN_FLIGHT.inc()
+    try:
+        cached = None if request.bypass_cache else await comparison_cache.aget(cache_key)
+        if cached is not None:
+            outcome = "cached"
+            await websocket.send_json({
+                "type": "result",
+                "data": cached.model_copy(update={"cached": True, "query": query}).model_dump(),
+            })
+            return
+        
+        client, agent_id = await initialize_parlant()
+        # Both legs queue frames; a single sender writes them to the socket in order
+        frames: asyncio.Queue = asyncio.Queue()
+        
+        async def traditional_leg() -> TraditionalStream:
+            traditional = TraditionalStream(query, prompt_mode)
+            async for delta in traditional.tokens():
+                frames.put_nowait({"type": "traditional_token", "text": delta})
+            frames.put_nowait({"type": "traditional_done", **traditional.summary()})
+            return traditional
+        
+        async def on_parlant_event(event: ParlantEvent) -> None:
+            frames.put_nowait(parlant_event_frame(event))
+        
+        async def parlant_leg() -> tuple[str, str, float]:
+            parlant_response, reasoning, parlant_ms = await run_parlant_leg(client, agent_id, query, on_event=on_parlant_event)
+            frames.put_nowait({"type": "parlant_done", "parlant_response": parlant_response, "parlant_ms": round(parlant_ms, 1)})
+            frames.put_nowait({"type": "reasoning", "reasoning": reasoning})
+            return parlant_response, reasoning, parlant_ms
+        
+        async def run_legs() -> tuple[TraditionalStream, tuple[str, str, float]]:
+            try:
+                if concurrent:
+                    async with asyncio.TaskGroup() as tg:
+                        traditional_task = tg.create_task(traditional_leg())
+                        parlant_task = tg.create_task(parlant_leg())
+                    return traditional_task.result(), parlant_task.result()
+                return await traditional_leg(), await parlant_leg()
+            finally:
+                frames.put_nowait(None)
+        
+        async def send_frames() -> None:
+            while (frame := await frames.get()) is not None:
+                await websocket.send_json(frame)
+        
+        # A disconnect while sending cancels the legs, and a failed leg stops the sender
+        async with admission.slot():
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(send_frames())
+                legs_task = tg.create_task(run_legs())
+        traditional, (parlant_response, reasoning, parlant_ms) = legs_task.result()
+        
+        comparison = streamed_comparison(query, concurrent, traditional, parlant_response, reasoning, parlant_ms, started)
+        save_comparison(comparison)
+        if is_cacheable(comparison):
+            comparison_cache.set(cache_key, comparison)
+        outcome = "ok"
+        await websocket.send_json({"type": "result", "data": comparison.model_dump()})
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except Overloaded as e:
+        outcome = "rejected"
+        await websocket.send_json({"type": "error", "message": str(e), "status_code": e.status_code, "retry_after": e.retry_after})
+    except Exception as e:
+        # Failures inside the task groups surface as (possibly nested) ExceptionGroups
+        while isinstance(e, ExceptionGroup):
+            e = e.exceptions[0]
+        if isinstance(e, WebSocketDisconnect):
+            outcome = "cancelled"
+            raise e
+        logger.error(
+            "Error in WebSocket comparison",
+            exc_info=e,
+            extra={"category": "error", "error_type": type(e).__name__, "error_message": str(e)},
+        )
+        await websocket.send_json({
+            "type": "error",
+            "message": "Unable to process your query at this time. Please try again or contact support if the issue persists.",
+        })
+    finally:
+        IN_FLIGHT.dec()
+        COMPARE_LATENCY.observe(time.perf_counter() - started, outcome=outcome)
+
+
+@app.websocket("/api/compare/ws")
+async def compare_websocket(websocket: WebSocket):
+    """Side-by-side comparison channel.
+
+    Send a JSON ``CompareRequest`` per comparison; the server replies with
+    typed frames as each leg progresses: ``traditional_token``,
+    ``traditional_done``, ``parlant_message``, ``parlant_tool``,
+    ``parlant_status``, ``parlant_done``, ``reasoning`` and a final
+    ``result`` (or ``error``) frame. The connection stays open for further
+    queries.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                request = CompareRequest.model_validate_json(raw)
+            except ValidationError:
+                await websocket.send_json({"type": "error", "message": "Invalid request. Please check your input and try again."})
+                continue
+            if not request.query.strip():
+                await websocket.send_json({"type": "error", "message": "Please enter a query to compare."})
+                continue
+            if normalize_models(request.models):
+                await websocket.send_json({"type": "error", "message": "Multi-model comparisons are not streamed; use /api/compare or /api/jobs."})
+                continue
+            await websocket_comparison(websocket, request)
+    except WebSocketDisconnect:
+        pass
+
+
+@app.post("/api/compare/batch")
+async def compare_batch(request: BatchCompareRequest):
+    """Compare many queries with bounded concurrency, streaming NDJSON results as they finish.
+
+    Each line carries the query's ``index`` in the request and either the
+    ``CompareData`` (with per-leg timings) or an error message. A final
+    summary line with ``"done": true`` closes the stream.
+    """
+    queries = [query.strip() for query in request.queries]
+    if not queries or len(queries) > BATCH_MAX_QUERIES:
+        return StandardResponse(
+            status_code=400,
+            status=False,
+            message=f"Please provide between 1 and {BATCH_MAX_QUERIES} queries.",
+            path="/api/compare/batch",
+            data={}
+        )
+    
+    concurrency = max(1, min(request.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    # More would only wait for background admission slots
+    if admission.max_background:
+        concurrency = min(concurrency, admission.max_background)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run_one(index: int, query: str) -> dict:
+        if not query:
+            return {"index": index, "status": False, "message": "Empty query.", "data": {}}
+        async with semaphore:
+            try:
+                # The batch already bounds its own concurrency, so its items wait for slots
+                result = await get_comparison(
+                    query,
+                    concurrent=request.concurrent,
+                    bypass_cache=request.bypass_cache,
+                    prompt_mode=request.prompt_mode,
+                    patient=True,
+                )
+                return {"index": index, "status": True, "message": "Comparison completed successfully", "data": result.model_dump()}
+            except HTTPException as e:
+                return {"index": index, "status": False, "message": str(e.detail), "data": {"query": query}}
+            except Overloaded as e:
+                return {"index": index, "status": False, "message": str(e), "data": {"query": query, "reason": e.reason}}
+    
+    async def stream_results():
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(run_one(index, query)) for index, query in enumerate(queries)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                succeeded += line["status"]
+                yield json.dumps(line) + "\n"
+            yield json.dumps({
+                "done": True,
+                "total": len(queries),
+                "succeeded": succeeded,
+                "failed": len(queries) - succeeded,
+                "concurrency": concurrency,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }) + "\n"
+        finally:
+            # Client went away or the stream finished: stop any remaining work
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+async def run_job(query: str, options: dict) -> dict:
+    """Run one stored comparison job; jobs wait for an admission slot instead of being rejected."""
+    comparison = await get_comparison(
+        query,
+        concurrent=options.get("concurrent"),
+        bypass_cache=options.get("bypass_cache", False),
+        prompt_mode=options.get("prompt_mode"),
+        patient=True,
+        models=options.get("models"),
+    )
+    return comparison.model_dump()
+
+
+# Jobs are written to SQLite before their id is returned and run by a fixed pool of workers
+job_runner = JobRunner(
+    JobStore(JOB_STORE_PATH),
+    run_job,
+    workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    retention=JOB_RETENTION,
+    max_attempts=JOB_MAX_ATTEMPTS,
+) if JOB_STORE_PATH else None
+
+
+def jobs_disabled_response(path: str) -> StandardResponse:
+    return StandardResponse(
+        status_code=503,
+        status=False,
+        message="Comparison jobs are disabled. Set JOB_STORE_PATH to enable them.",
+        path=path,
+        data={}
+    )
+
+
+@app.post("/api/jobs", response_model=StandardResponse)
+async def submit_job(request: CompareRequest):
+    """Queue a comparison and return its job id immediately.
+
+    Poll ``GET /api/jobs/{job_id}`` for the status and fetch the comparison
+    from ``GET /api/jobs/{job_id}/result`` once it is done.
+    """
+    if job_runner is None:
+        return jobs_disabled_response("/api/jobs")
+    query = request.query.strip()
+    if not query:
+        return StandardResponse(
+            status_code=400,
+            status=False,
+            message="Please enter a query to compare.",
+            path="/api/jobs",
+            data={}
+        )
+    models = normalize_models(request.models)
+    invalid = invalid_models_response(models, "/api/jobs")
+    if invalid is not None:
+        return invalid
+    
+    options = {
+        "concurrent": request.concurrent,
+        "bypass_cache": request.bypass_cache,
+        "prompt_mode": request.prompt_mode,
+        "models": models,
+    }
+    try:
+        job_id = await job_runner.submit(query, options)
+    except Overloaded as e:
+        return overloaded_response(e, "/api/jobs")
+    return StandardResponse(
+        status_code=202,
+        status=True,
+        message="Comparison job queued",
+        path="/api/jobs",
+        data={
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/api/jobs/{job_id}",
+            "result_url": f"/api/jobs/{job_id}/result",
+        }
+    )
+
+
+@app.get("/api/jobs/{job_id}", response_model=StandardResponse)
+async def get_job(job_id: str):
+    """Get a job's status (queued, running, done or failed) and timestamps."""
+    path = f"/api/jobs/{job_id}"
+    if job_runner is None:
+        return jobs_disabled_response(path)
+    job = await job_runner.get(job_id)
+    if job is None:
+        return StandardResponse(status_code=404, status=False, message="Job not found", path=path, data={})
+    return StandardResponse(status_code=200, status=True, message="Job retrieved successfully", path=path, data=job)
+
+
+@app.get("/api/jobs/{job_id}/result", response_model=StandardResponse)
+async def get_job_result(job_id: str):
+    """Get a finished job's comparison; ``status_code`` is 202 while the job is still queued or running."""
+    path = f"/api/jobs/{job_id}/result"
+    if job_runner is None:
+        return jobs_disabled_response(path)
+    job = await job_runner.get(job_id, with_result=True)
+    if job is None:
+        return StandardResponse(status_code=404, status=False, message="Job not found", path=path, data={})
+    if job["status"] == "done":
+        return StandardResponse(status_code=200, status=True, message="Comparison completed successfully", path=path, data=job["result"])
+    if job["status"] == "failed":
+        return StandardResponse(status_code=500, status=False, message=job["error"] or "Job failed", path=path, data=job)
+    return StandardResponse(status_code=202, status=False, message=f"Job is {job['status']}", path=path, data=job)
+
+
+@app.get("/api/cache/stats", response_model=StandardResponse)
+async def get_cache_stats():
+    """Get comparison cache, request coalescing and admission counters."""
+    return StandardResponse(
+        status_code=200,
+        status=True,
+        message="Cache statistics retrieved successfully",
+        path="/api/cache/stats",
+        data={**comparison_cache.stats(), "coalescing": comparison_flights.stats(), "admission": admission.stats()}
+    )
+
+
+@app.get("/api/history", response_model=StandardResponse)
+async def get_history(
+    limit: int = 50,
+    before_id: Optional[int] = None,
+    model: Optional[str] = None,
+    query: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """List saved comparisons, newest first.
+
+    Pass ``next_before_id`` from a response as ``before_id`` to fetch the next
+    page. ``query`` matches the same normalized text the cache uses.
+    """
+    if result_store is None:
+        return StandardResponse(
+            status_code=503,
+            status=False,
+            message="Result history is disabled. Set RESULT_STORE_PATH to enable it.",
+            path="/api/history",
+            data={}
+        )
+    
+    limit = max(1, min(limit, 200))
+    items = await result_store.history(
+        limit=limit,
+        before_id=before_id,
+        model=model,
+        query=query,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+    )
+    return StandardResponse(
+        status_code=200,
+        status=True,
+        message="History retrieved successfully",
+        path="/api/history",
+        data={
+            "items": items,
+            "next_before_id": items[-1]["id"] if len(items) == limit else None,
+        }
+    )
+
+
+@app.get("/api/history/{comparison_id}", response_model=StandardResponse)
+async def get_history_item(comparison_id: int):
+    """Get one saved comparison by id."""
+    path = f"/api/history/{comparison_id}"
+    if result_store is None:
+        return StandardResponse(
+            status_code=503,
+            status=False,
+            message="Result history is disabled. Set RESULT_STORE_PATH to enable it.",
+            path=path,
+            data={}
+        )
+    
+    item = await result_store.get(comparison_id)
+    if item is None:
+        return StandardResponse(
+            status_code=404,
+            status=False,
+            message="Comparison not found.",
+            path=path,
+            data={}
+        )
+    return StandardResponse(
+        status_code=200,
+        status=True,
+        message="Comparison retrieved successfully",
+        path=path,
+        data=item
+    )
+
+
+@app.get("/api/analytics", response_model=StandardResponse)
+async def get_analytics(
+    group_by: Literal[GROUP_BY] = "model",
+    window: str = "1d",
+    model: Optional[str] = None,
+    prompt_hash: Optional[str] = None,
+    source: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Aggregate saved comparisons by model, prompt hash or time window.
+
+    Each group reports per-leg latency percentiles, error rate, reply length
+    distributions, tool usage and token totals. ``window`` (e.g. ``15m``,
+    ``1h``, ``1d``) sets the bucket size when grouping by window.
+    """
+    if history_columns is None:
+        return StandardResponse(
+            status_code=503,
+            status=False,
+            message="Result history is disabled. Set RESULT_STORE_PATH to enable it.",
+            path="/api/analytics",
+            data={}
+        )
+    
+    try:
+        report = await asyncio.to_thread(
+            history_columns.report,
+            group_by=group_by,
+            window=window,
+            model=model,
+            prompt_hash=prompt_hash,
+            source=source,
+            since=since.timestamp() if since else None,
+            until=until.timestamp() if until else None,
+        )
+    except ValueError as e:
+        return StandardResponse(
+            status_code=400,
+            status=False,
+            message=str(e),
+            path="/api/analytics",
+            data={}
+        )
+    return StandardResponse(
+        status_code=200,
+        status=True,
+        message="Analytics computed successfully",
+        path="/api/analytics",
+        data=report
+    )
+
+
+async def publish_metrics(interval: float = 10.0):
+    """Publish this worker's metrics regularly so /metrics on any worker includes them."""
+    while True:
+        try:
+            await asyncio.to_thread(shared_metrics.publish, shared_metrics.snapshot())
+        except sqlite3.Error as e:
+            logger.warning("Failed to publish metrics", extra={"category": "metrics", "error_message": str(e)})
+        await asyncio.sleep(interval)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose stage latency histograms and counters in Prometheus text format.
+
+    With several workers the samples are the sum over all of them.
+    """
+    if shared_metrics is not None:
+        text = await asyncio.to_thread(shared_metrics.render, shared_metrics.snapshot())
+    else:
+        text = REGISTRY.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/demo-queries", response_model=StandardResponse)
 async def get_demo_queries():
     """Get the list of demo queries from configuration."""
@@ -349,26 +1458,43 @@ async def get_demo_queries():
     )
 
 
+def openrouter_health() -> dict:
+    """Circuit breaker state and current hedge delay for the OpenRouter leg, plus any other requested models."""
+    health = {**openrouter_breaker.snapshot(), "hedge_delay_s": round(hedge_delay(), 2)}
+    others = {model: breaker.snapshot() for model, breaker in model_breakers.items() if breaker is not openrouter_breaker}
+    if others:
+        health["models"] = others
+    return health
+
+
 @app.get("/api/health", response_model=StandardResponse)
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint.
+
+    Parlant readiness decides the status code; an open OpenRouter circuit
+    breaker is reported as degraded since Parlant replies still work.
+    """
+    openrouter = openrouter_health()
     try:
         # Try to initialize Parlant to check if backend is ready
         await initialize_parlant()
         return StandardResponse(
             status_code=200,
             status=True,
-            message="Service is healthy",
+            message="Service is healthy" if openrouter["state"] == "closed" else "Service is degraded: OpenRouter circuit breaker is " + openrouter["state"],
             path="/api/health",
             data={
                 "initialized": True,
                 "parlant_ready": True,
-                "error": None
+                "error": None,
+                "openrouter": openrouter,
+                "admission": admission.stats(),
+                "jobs": job_runner.stats() if job_runner is not None else None,
             }
         )
     except Exception as e:
         error_msg = str(e)
-        print(f"Health check error: {error_msg}")
+        logger.warning("Health check error", extra={"category": "health", "error_message": error_msg})
         return StandardResponse(
             status_code=503,
             status=False,
@@ -377,7 +1503,10 @@ async def health_check():
             data={
                 "initialized": False,
                 "parlant_ready": False,
-                "error": error_msg
+                "error": error_msg,
+                "openrouter": openrouter,
+                "admission": admission.stats(),
+                "jobs": job_runner.stats() if job_runner is not None else None,
             }
         )
 
@@ -412,12 +1541,18 @@ if __name__ == "__main__":
     print(f"📚 API docs available at {api_url}/docs")
     print(f"🌐 Next.js frontend should run on {FRONTEND_URL}")
     print("⚠️  Make sure parlant_agent_server.py is running first!")
+    if API_WORKERS > 1:
+        print(f"⚙️  Running {API_WORKERS} worker processes sharing {SHARED_STATE_PATH or 'no shared state'}")
     
-    # Use import string format for reload to work properly
+    # Use import string format for reload and workers to work properly
+    # Each worker runs its own lifespan, so every process opens its own upstream connections
     uvicorn.run(
         "api_server:app",
         host=API_HOST,
         port=API_PORT,
-        reload=True,
-        log_level="info"
+        reload=API_RELOAD and API_WORKERS == 1,
+        workers=API_WORKERS,
+        log_level="info",
+        # Let uvicorn's loggers propagate to the queue-backed root handler
+        log_config=None,
     )
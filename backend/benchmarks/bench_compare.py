@@ -0,0 +1,188 @@
+"""Offline load benchmark for /api/compare against local stub upstreams.
+
+Starts the OpenRouter and Parlant stubs from ``stub_servers.py``, points the
+backend at them through environment variables, and drives the real FastAPI
+app in-process at several concurrency levels. Reports throughput and
+p50/p95/p99 latency per level, and can save results or compare them against
+a saved baseline to flag regressions.
+
+Usage (from the backend/ directory):
+    uv run benchmarks/bench_compare.py --levels 1,8,32 --requests 64
+    uv run benchmarks/bench_compare.py --save baseline.json
+    uv run benchmarks/bench_compare.py --baseline baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import pathlib
+import random
+import sys
+import time
+
+import httpx
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+from stub_servers import LatencyModel, create_openrouter_stub, create_parlant_stub, start_server, stop_server
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total: int, run_id: str) -> dict:
+    """Send ``total`` comparisons with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        # Unique queries and bypass_cache keep the cache and coalescing out of the measurement
+        payload = {"query": f"Benchmark query {run_id}-{concurrency}-{index}", "bypass_cache": True}
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/compare", json=payload)
+                ok = response.status_code == 200 and response.json().get("status") is True
+            except httpx.HTTPError:
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+
+def print_results(results: list[dict], settings: dict) -> None:
+    table = Table(
+        title="⏱️  /api/compare offline benchmark",
+        caption=", ".join(f"{k}={v}" for k, v in settings.items()),
+        box=box.ROUNDED,
+        header_style="bold magenta",
+        title_style="bold blue",
+    )
+    for column in ("Concurrency", "Requests", "Errors", "Throughput (req/s)", "p50 (ms)", "p95 (ms)", "p99 (ms)"):
+        table.add_column(column, justify="right")
+    for r in results:
+        table.add_row(*(str(r[k]) for k in ("concurrency", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms")))
+    Console().print(table)
+
+
+def find_regressions(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Compare p95 latency and throughput per concurrency level against a baseline."""
+    previous = {r["concurrency"]: r for r in baseline}
+    problems: list[str] = []
+    for r in results:
+        base = previous.get(r["concurrency"])
+        if base is None:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"concurrency {r['concurrency']}: p95 {base['p95_ms']} -> {r['p95_ms']} ms")
+        if r["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append(f"concurrency {r['concurrency']}: throughput {base['throughput_rps']} -> {r['throughput_rps']} req/s")
+    return problems
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /api/compare against local stub upstreams.")
+    parser.add_argument("--levels", default="1,4,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--llm-latency", default="lognormal:800:0.35", help="OpenRouter completion latency spec")
+    parser.add_argument("--first-token", default="lognormal:250:0.3", help="OpenRouter time-to-first-token spec (streamed calls)")
+    parser.add_argument("--session-latency", default="fixed:30", help="Parlant session creation latency spec")
+    parser.add_argument("--reply-latency", default="lognormal:1200:0.35", help="Parlant agent turn latency spec")
+    parser.add_argument("--message-chunks", type=int, default=1, help="Message events per Parlant reply")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for latency sampling")
+    parser.add_argument("--save", type=pathlib.Path, help="Write results as JSON to this file")
+    parser.add_argument("--baseline", type=pathlib.Path, help="Fail if results regress against this saved JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression (default 0.15)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    openrouter_app = create_openrouter_stub(
+        LatencyModel.parse(args.llm_latency, rng), LatencyModel.parse(args.first_token, rng)
+    )
+    parlant_app = create_parlant_stub(
+        LatencyModel.parse(args.session_latency, rng), LatencyModel.parse(args.reply_latency, rng), args.message_chunks
+    )
+    openrouter_server, openrouter_task, openrouter_url = await start_server(openrouter_app)
+    parlant_server, parlant_task, parlant_url = await start_server(parlant_app)
+
+    # The backend reads its configuration at import time, so point it at the stubs first
+    os.environ.update({
+        "OPENROUTER_API_KEY": "stub-key",
+        "OPENROUTER_BASE_URL": openrouter_url,
+        "PARLANT_BASE_URL": parlant_url,
+        "PARLANT_AGENT_ID": "stub-agent",
+        # Keep synthetic runs out of the real comparison history, job queue and shared state
+        "RESULT_STORE_PATH": "",
+        "JOB_STORE_PATH": "",
+        "SHARED_STATE_PATH": "",
+    })
+    os.environ.setdefault("CORS_ORIGINS", "http://localhost:3300")
+    import api_server
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    settings = {
+        "llm": args.llm_latency,
+        "reply": args.reply_latency,
+        "session": args.session_latency,
+        "mode": api_server.COMPARE_MODE,
+    }
+    results: list[dict] = []
+    run_id = f"{int(time.time())}"
+    transport = httpx.ASGITransport(app=api_server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            # One warm-up request so client creation and session pool start are not measured
+            await client.post("/api/compare", json={"query": f"warm-up {run_id}", "bypass_cache": True})
+            for level in [int(x) for x in args.levels.split(",") if x.strip()]:
+                results.append(await run_level(client, level, args.requests, run_id))
+    finally:
+        if api_server.session_pool is not None:
+            await api_server.session_pool.close()
+        await stop_server(openrouter_server, openrouter_task)
+        await stop_server(parlant_server, parlant_task)
+
+    print_results(results, settings)
+    if args.save:
+        args.save.write_text(json.dumps({"settings": settings, "results": results}, indent=2))
+        print(f"💾 Results saved to {args.save}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        problems = find_regressions(results, baseline, args.tolerance)
+        if problems:
+            print("❌ Performance regressions detected:")
+            for problem in problems:
+                print(f"   - {problem}")
+            return 1
+        print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,282 @@
+"""Local stand-ins for the OpenRouter and Parlant APIs used by the backend.
+
+The OpenRouter stub implements ``POST /chat/completions`` (plain and
+streamed) as called through the OpenAI SDK. The Parlant stub implements the
+session and event endpoints used by ``parlant_client_utils``: create,
+retrieve and delete sessions, post customer messages, and long-poll events.
+After each customer message the stub agent emits status, tool and message
+events spread over a sampled reply latency, ending with a ``ready`` status.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+class LatencyModel:
+    """Sample latencies in seconds from a fixed, uniform or lognormal distribution.
+
+    Specs are written as ``fixed:MS``, ``uniform:LOW_MS:HIGH_MS`` or
+    ``lognormal:MEDIAN_MS:SIGMA``.
+    """
+
+    def __init__(self, kind: str, a: float, b: float = 0.0, rng: Optional[random.Random] = None):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def parse(cls, spec: str, rng: Optional[random.Random] = None) -> "LatencyModel":
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params]
+        if kind == "fixed" and len(values) == 1:
+            return cls(kind, values[0], rng=rng)
+        if kind in ("uniform", "lognormal") and len(values) == 2:
+            return cls(kind, values[0], values[1], rng=rng)
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.a
+        elif self.kind == "uniform":
+            ms = self.rng.uniform(self.a, self.b)
+        else:
+            ms = self.rng.lognormvariate(0.0, self.b) * self.a
+        return max(0.0, ms) / 1000
+
+    def __str__(self) -> str:
+        if self.kind == "fixed":
+            return f"fixed:{self.a:g}"
+        return f"{self.kind}:{self.a:g}:{self.b:g}"
+
+
+STUB_REPLY = (
+    "Hello! I'm InsuranceBot, your life insurance advisor. I provide general information only, "
+    "not personalized financial advice. Please keep your current policy active until a new one is "
+    "approved, and consult with a licensed insurance agent for specific recommendations."
+)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def create_openrouter_stub(latency: LatencyModel, first_token: LatencyModel, tokens: int = 120) -> FastAPI:
+    """Build an app that mimics the OpenAI chat-completions API served by OpenRouter.
+
+    Non-streamed calls sleep for one ``latency`` sample. Streamed calls wait
+    ``first_token`` before the first chunk and spread the rest of the
+    ``latency`` sample over ``tokens`` chunks.
+    """
+    app = FastAPI()
+    words = STUB_REPLY.split()
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        pieces = [words[i % len(words)] + " " for i in range(tokens)]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": tokens, "total_tokens": prompt_tokens + tokens}
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency.sample())
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces).strip()},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        async def stream():
+            total = latency.sample()
+            ttft = min(first_token.sample(), total)
+            per_token = (total - ttft) / max(1, tokens)
+            await asyncio.sleep(ttft)
+            for index, piece in enumerate(pieces):
+                if index:
+                    await asyncio.sleep(per_token)
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+class _StubSession:
+    def __init__(self, agent_id: str):
+        self.id = f"sess-{uuid.uuid4().hex[:12]}"
+        self.agent_id = agent_id
+        self.creation_utc = _now()
+        self.events: list[dict] = []
+        self.changed = asyncio.Condition()
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "agent_id": self.agent_id,
+            "customer_id": "guest",
+            "creation_utc": self.creation_utc,
+            "title": None,
+            "mode": "auto",
+            "consumption_offsets": {"client": 0},
+        }
+
+    async def emit(self, source: str, kind: str, data: dict, correlation_id: str) -> dict:
+        event = {
+            "id": uuid.uuid4().hex[:12],
+            "source": source,
+            "kind": kind,
+            "offset": len(self.events),
+            "creation_utc": _now(),
+            "correlation_id": correlation_id,
+            "data": data,
+            "deleted": False,
+        }
+        async with self.changed:
+            self.events.append(event)
+            self.changed.notify_all()
+        return event
+
+
+def create_parlant_stub(session_latency: LatencyModel, reply_latency: LatencyModel, message_chunks: int = 1) -> FastAPI:
+    """Build an app that mimics the Parlant session/event API.
+
+    ``session_latency`` is added to session creation; the agent's turn takes
+    one ``reply_latency`` sample and delivers its reply as ``message_chunks``
+    message events spread across the second half of that time.
+    """
+    app = FastAPI()
+    sessions: dict[str, _StubSession] = {}
+
+    async def agent_turn(session: _StubSession, correlation_id: str) -> None:
+        total = reply_latency.sample()
+        await session.emit("ai_agent", "status", {"status": "acknowledged", "data": {}}, correlation_id)
+        await session.emit("ai_agent", "status", {"status": "processing", "data": {}}, correlation_id)
+        await asyncio.sleep(total / 2)
+        await session.emit("ai_agent", "tool", {"tool_calls": [{"tool_id": "stub:get_policy_types", "arguments": {}, "result": {}}]}, correlation_id)
+        await session.emit("ai_agent", "status", {"status": "typing", "data": {}}, correlation_id)
+        sentences = STUB_REPLY.split(". ")
+        chunk_size = max(1, -(-len(sentences) // message_chunks))
+        for index in range(0, len(sentences), chunk_size):
+            await asyncio.sleep(total / 2 / message_chunks)
+            message = ". ".join(sentences[index:index + chunk_size])
+            await session.emit("ai_agent", "message", {"message": message, "participant": {"display_name": "Stub"}}, correlation_id)
+        await session.emit("ai_agent", "status", {"status": "ready", "data": {}}, correlation_id)
+
+    def not_found() -> JSONResponse:
+        return JSONResponse(status_code=404, content={"detail": "Session not found"})
+
+    @app.post("/sessions")
+    async def create_session(request: Request):
+        body = await request.json()
+        await asyncio.sleep(session_latency.sample())
+        session = _StubSession(body.get("agent_id", "stub-agent"))
+        sessions[session.id] = session
+        return JSONResponse(status_code=201, content=session.as_dict())
+
+    @app.get("/sessions/{session_id}")
+    async def retrieve_session(session_id: str):
+        session = sessions.get(session_id)
+        return session.as_dict() if session else not_found()
+
+    @app.delete("/sessions/{session_id}")
+    async def delete_session(session_id: str):
+        return Response(status_code=204) if sessions.pop(session_id, None) else not_found()
+
+    @app.post("/sessions/{session_id}/events")
+    async def create_event(session_id: str, request: Request):
+        session = sessions.get(session_id)
+        if session is None:
+            return not_found()
+        body = await request.json()
+        correlation_id = uuid.uuid4().hex[:12]
+        event = await session.emit(body.get("source", "customer"), body.get("kind", "message"), {"message": body.get("message", "")}, correlation_id)
+        if event["source"] == "customer":
+            asyncio.create_task(agent_turn(session, correlation_id))
+        return JSONResponse(status_code=201, content=event)
+
+    @app.get("/sessions/{session_id}/events")
+    async def list_events(
+        session_id: str,
+        min_offset: int = 0,
+        kinds: Optional[str] = None,
+        source: Optional[str] = None,
+        wait_for_data: int = 60,
+    ):
+        session = sessions.get(session_id)
+        if session is None:
+            return not_found()
+        wanted_kinds = set(kinds.split(",")) if kinds else None
+
+        def matching() -> list[dict]:
+            return [
+                e for e in session.events
+                if e["offset"] >= min_offset
+                and (wanted_kinds is None or e["kind"] in wanted_kinds)
+                and (source is None or e["source"] == source)
+            ]
+
+        events = matching()
+        if events or wait_for_data <= 0:
+            return events
+        try:
+            async with session.changed:
+                await asyncio.wait_for(session.changed.wait_for(lambda: bool(matching())), timeout=wait_for_data)
+        except asyncio.TimeoutError:
+            return JSONResponse(status_code=504, content={"detail": "Request timed out"})
+        return matching()
+
+    return app
+
+
+async def start_server(app: FastAPI, host: str = "127.0.0.1", port: int = 0) -> tuple[uvicorn.Server, asyncio.Task, str]:
+    """Serve ``app`` in the current event loop and return the server, its task and base URL."""
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"http://{host}:{bound_port}"
+
+
+async def stop_server(server: uvicorn.Server, task: asyncio.Task) -> None:
+    server.should_exit = True
+    await task
@@ -0,0 +1,274 @@
+"""Record and replay OpenRouter and Parlant HTTP exchanges.
+
+With ``CASSETTE_MODE=record`` every response from OpenRouter and Parlant is
+captured (status, content headers and body chunks with their arrival times)
+and written to ``CASSETTE_PATH`` as gzipped JSON lines when the process
+exits. Requests are identified by upstream, method, path, query string and a
+hash of the body, so the large prompts are not stored.
+
+With ``CASSETTE_MODE=replay`` the same requests are answered from the
+cassette without any network access. Repeated identical requests get the
+recorded responses in order. ``CASSETTE_TIME_SCALE`` replays the original
+timing (1.0), a faster version of it (e.g. 0.1) or none at all (0, the
+default). Parlant session ids are handed out in whatever order the pool
+creates them, so on replay each live session id is mapped to the recorded
+session that received the same first request.
+"""
+import asyncio
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "off", "record" or "replay"
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").strip().lower()
+if CASSETTE_MODE not in ("off", "record", "replay"):
+    raise ValueError("CASSETTE_MODE must be one of 'off', 'record' or 'replay'")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "data/cassette.jsonl.gz")
+CASSETTE_TIME_SCALE = float(os.getenv("CASSETTE_TIME_SCALE", "0"))
+
+# Query parameters that vary between runs without changing the response
+IGNORED_PARAMS = frozenset({"wait_for_data"})
+# Path segments followed by an id that may be remapped on replay
+ID_SEGMENTS = ("sessions",)
+# Response headers worth keeping; the body is stored exactly as received
+KEPT_HEADERS = ("content-type", "content-encoding")
+
+
+class CassetteMiss(httpx.TransportError):
+    """Raised on replay when the cassette has no response for a request."""
+
+
+def _body_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:16] if content else ""
+
+
+def _split_id(path: str) -> tuple[str, Optional[str]]:
+    """Return the path with its first remappable id replaced by ``{id}``, and that id."""
+    parts = path.split("/")
+    for i, part in enumerate(parts[:-1]):
+        if part in ID_SEGMENTS and parts[i + 1]:
+            found = parts[i + 1]
+            parts[i + 1] = "{id}"
+            return "/".join(parts), found
+    return path, None
+
+
+def _request_fields(upstream: str, request: httpx.Request) -> dict:
+    params = sorted((k, v) for k, v in request.url.params.multi_items() if k not in IGNORED_PARAMS)
+    return {
+        "upstream": upstream,
+        "method": request.method,
+        "path": request.url.path,
+        "query": str(httpx.QueryParams(params)),
+        "body": _body_hash(request.content),
+    }
+
+
+def _key(fields: dict, path: Optional[str] = None) -> tuple:
+    return (fields["upstream"], fields["method"], path or fields["path"], fields["query"], fields["body"])
+
+
+class Cassette:
+    """Recorded exchanges for one run, loaded for replay or collected for saving."""
+
+    def __init__(self, path: str, mode: str, time_scale: float = 0.0):
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self.exchanges: list[dict] = []
+        self._lock = threading.Lock()
+        # Replay indexes: exact request key -> responses, and id-less key -> recorded ids
+        self._by_key: dict[tuple, list[dict]] = defaultdict(list)
+        self._ids_by_template: dict[tuple, list[str]] = defaultdict(list)
+        self._served: dict[tuple, int] = defaultdict(int)
+        self._aliases: dict[str, str] = {}
+        self._claimed: set[str] = set()
+        if mode == "replay":
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._index(json.loads(line))
+        logger.info(
+            f"Replaying {len(self.exchanges)} exchanges from {self.path}",
+            extra={"category": "cassette"},
+        )
+
+    def _index(self, exchange: dict) -> None:
+        self.exchanges.append(exchange)
+        self._by_key[_key(exchange)].append(exchange)
+        template, recorded_id = _split_id(exchange["path"])
+        if recorded_id is not None:
+            ids = self._ids_by_template[_key(exchange, template)]
+            if recorded_id not in ids:
+                ids.append(recorded_id)
+
+    def add(self, exchange: dict) -> None:
+        with self._lock:
+            self.exchanges.append(exchange)
+
+    def save(self) -> None:
+        """Write every recorded exchange to the cassette file."""
+        with self._lock:
+            exchanges = list(self.exchanges)
+        if not exchanges:
+            return
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for exchange in exchanges:
+                f.write(json.dumps(exchange, separators=(",", ":")) + "\n")
+        logger.info(f"Recorded {len(exchanges)} exchanges to {self.path}", extra={"category": "cassette"})
+
+    def find(self, fields: dict) -> dict:
+        """Return the next recorded response for a request, remapping session ids."""
+        template, live_id = _split_id(fields["path"])
+        path = fields["path"]
+        if live_id is not None:
+            if live_id not in self._aliases:
+                self._aliases[live_id] = self._claim(fields, template, live_id)
+                self._claimed.add(self._aliases[live_id])
+            path = template.replace("{id}", self._aliases[live_id], 1)
+        key = _key(fields, path)
+        responses = self._by_key.get(key)
+        if not responses:
+            raise CassetteMiss(f"No recorded response for {fields['method']} {fields['path']}?{fields['query']}")
+        served = self._served[key]
+        self._served[key] = served + 1
+        # Requests repeated more often than during recording get the last response again
+        return responses[min(served, len(responses) - 1)]
+
+    def _claim(self, fields: dict, template: str, live_id: str) -> str:
+        if live_id not in self._claimed and _key(fields) in self._by_key:
+            return live_id
+        for recorded_id in self._ids_by_template.get(_key(fields, template), ()):
+            if recorded_id not in self._claimed:
+                return recorded_id
+        return live_id
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """Pass body chunks through while noting when each one arrived."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, cassette: Cassette, exchange: dict, started: float):
+        self.stream = stream
+        self.cassette = cassette
+        self.exchange = exchange
+        self.started = started
+        self.chunks: list[tuple[float, bytes]] = []
+        self.complete = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            self.chunks.append((round((time.perf_counter() - self.started) * 1000, 1), chunk))
+            yield chunk
+        self.complete = True
+
+    async def aclose(self) -> None:
+        await self.stream.aclose()
+        # Bodies abandoned half-way would replay as truncated responses
+        if not self.complete:
+            return
+        try:
+            chunks = [[ms, chunk.decode("utf-8")] for ms, chunk in self.chunks]
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            chunks = [[ms, base64.b64encode(chunk).decode("ascii")] for ms, chunk in self.chunks]
+            encoding = "base64"
+        self.cassette.add({**self.exchange, "encoding": encoding, "chunks": chunks})
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """Yield recorded body chunks, optionally at their original offsets."""
+
+    def __init__(self, exchange: dict, time_scale: float, started: float):
+        self.exchange = exchange
+        self.time_scale = time_scale
+        self.started = started
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        decode = base64.b64decode if self.exchange["encoding"] == "base64" else str.encode
+        for ms, data in self.exchange["chunks"]:
+            if self.time_scale:
+                delay = self.started + ms * self.time_scale / 1000 - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield decode(data)
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Transport that records responses from ``transport`` or replays them from a cassette."""
+
+    def __init__(self, cassette: Cassette, upstream: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.upstream = upstream
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        fields = _request_fields(self.upstream, request)
+        if self.cassette.mode == "replay":
+            exchange = self.cassette.find(fields)
+            if self.cassette.time_scale:
+                await asyncio.sleep(exchange["headers_ms"] * self.cassette.time_scale / 1000)
+            return httpx.Response(
+                exchange["status"],
+                headers=exchange["headers"],
+                stream=_ReplayStream(exchange, self.cassette.time_scale, started),
+                request=request,
+            )
+
+        response = await self.transport.handle_async_request(request)
+        exchange = {
+            **fields,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+            "headers_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        response.stream = _RecordingStream(response.stream, self.cassette, exchange, started)
+        return response
+
+    async def aclose(self) -> None:
+        if self.transport is not None:
+            await self.transport.aclose()
+
+
+_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the process-wide cassette, or None when CASSETTE_MODE is off."""
+    global _cassette
+    if CASSETTE_MODE == "off":
+        return None
+    if _cassette is None:
+        _cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_TIME_SCALE)
+        if CASSETTE_MODE == "record":
+            atexit.register(_cassette.save)
+    return _cassette
+
+
+def wrap_transport(upstream: str, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """Wrap ``transport`` for recording or replay when a cassette mode is set."""
+    cassette = get_cassette()
+    if cassette is None:
+        return transport
+    return CassetteTransport(cassette, upstream, transport)
+
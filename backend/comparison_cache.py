@@ -0,0 +1,312 @@
+"""Bounded LRU + TTL cache and in-flight coalescing for comparison results."""
+import asyncio
+import hashlib
+import json
+import logging
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different spellings share a cache entry."""
+    text = re.sub(r"\s+", " ", query.strip().lower())
+    return text.rstrip(" .!?")
+
+
+def fingerprint(text: str) -> str:
+    """Return a short stable hash of a prompt or other text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class ComparisonCache:
+    """In-memory comparison cache with size- and age-based eviction.
+
+    Entries are kept in least-recently-used order; reading an entry moves it to
+    the end, and inserting past ``max_entries`` evicts from the front. Entries
+    older than ``ttl`` seconds are dropped when they are next read.
+    A ``max_entries`` of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0):
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(query: str, model: str, prompt_fingerprint: str) -> str:
+        """Build a cache key from the normalized query, model and prompt fingerprint."""
+        return fingerprint(f"{normalize_query(query)}\x1f{model}\x1f{prompt_fingerprint}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for ``key`` or None on a miss."""
+        if not self.enabled:
+            return None
+        value = self._get_local(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        """True if ``key`` has a fresh entry; unlike ``get`` this leaves counters and LRU order alone."""
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() - entry[0] <= self.ttl
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Async ``get``; subclasses with slower backends read off the event loop."""
+        return self.get(key)
+
+    async def acontains(self, key: str) -> bool:
+        """Async ``key in cache``."""
+        return key in self
+
+    def set(self, key: str, value: Any) -> None:
+        """Store ``value`` under ``key``, evicting the least recently used entries."""
+        if not self.enabled:
+            return
+        self._set_local(key, value, age=0.0)
+
+    def _set_local(self, key: str, value: Any, age: float) -> None:
+        self._entries[key] = (time.monotonic() - age, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return counters and current size for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS comparison_cache (
+    key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_comparison_cache_stored_at ON comparison_cache (stored_at);
+"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+class SharedComparisonCache(ComparisonCache):
+    """``ComparisonCache`` backed by a SQLite table shared by several server processes.
+
+    Lookups check this process's memory first and then the table, so a result
+    computed by one worker is a hit in every other. The table read is a
+    primary-key lookup on a local WAL database; ``aget`` runs it in a worker
+    thread, while writes go to memory at once and to the table on a background
+    thread. Values are stored as JSON text via ``dumps``/``loads``; rows that
+    fail to decode (e.g. written by an older version) count as misses.
+    """
+
+    # Expired and surplus rows are deleted after this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 256,
+        ttl: float = 3600.0,
+        dumps: Callable[[Any], str] = json.dumps,
+        loads: Callable[[str], Any] = json.loads,
+    ):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.path = path
+        self.dumps = dumps
+        self.loads = loads
+        self.shared_hits = 0
+        self._writes = 0
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Used for schema setup and clear(); reads open one connection per thread
+        self._conn = _connect(path)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SHARED_SCHEMA)
+        self._readers = threading.local()
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="comparison-cache")
+
+    def _get_shared(self, key: str) -> Optional[tuple[float, Any]]:
+        """Return ``(age, value)`` for a fresh row, or None."""
+        conn = getattr(self._readers, "conn", None)
+        try:
+            if conn is None:
+                conn = self._readers.conn = _connect(self.path)
+            row = conn.execute(
+                "SELECT stored_at, value FROM comparison_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache read failed", extra={"category": "cache", "error_message": str(e)})
+            return None
+        if row is None:
+            return None
+        age = time.time() - row[0]
+        if age > self.ttl:
+            return None
+        try:
+            return age, self.loads(row[1])
+        except (ValueError, TypeError) as e:
+            logger.warning("Shared cache entry could not be decoded", extra={"category": "cache", "error_message": str(e)})
+            return None
+
+    def _finish_get(self, key: str, value: Optional[Any], shared: Optional[tuple[float, Any]]) -> Optional[Any]:
+        if value is None:
+            if shared is None:
+                self.misses += 1
+                return None
+            age, value = shared
+            # Keep the entry's original age so it expires everywhere at the same time
+            self._set_local(key, value, age=age)
+            self.shared_hits += 1
+        self.hits += 1
+        return value
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        value = self._get_local(key)
+        return self._finish_get(key, value, None if value is not None else self._get_shared(key))
+
+    async def aget(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        value = self._get_local(key)
+        shared = None if value is not None else await asyncio.to_thread(self._get_shared, key)
+        return self._finish_get(key, value, shared)
+
+    def __contains__(self, key: str) -> bool:
+        return super().__contains__(key) or (self.enabled and self._get_shared(key) is not None)
+
+    async def acontains(self, key: str) -> bool:
+        if super().__contains__(key):
+            return True
+        return self.enabled and await asyncio.to_thread(self._get_shared, key) is not None
+
+    def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        super().set(key, value)
+        self._writer.submit(self._write, key, time.time(), self.dumps(value))
+
+    def _write(self, key: str, stored_at: float, data: str) -> None:
+        try:
+            if self._write_conn is None:
+                self._write_conn = _connect(self.path)
+            with self._write_conn:
+                self._write_conn.execute(
+                    "INSERT OR REPLACE INTO comparison_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                    (key, stored_at, data),
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._write_conn.execute("DELETE FROM comparison_cache WHERE stored_at < ?", (time.time() - self.ttl,))
+                    self._write_conn.execute(
+                        "DELETE FROM comparison_cache WHERE key IN "
+                        "(SELECT key FROM comparison_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Shared cache write failed", extra={"category": "cache", "error_message": str(e)})
+
+    def clear(self) -> None:
+        super().clear()
+        with self._conn:
+            self._conn.execute("DELETE FROM comparison_cache")
+
+    def close(self) -> None:
+        """Finish pending writes."""
+        self._writer.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "shared_path": self.path, "shared_hits": self.shared_hits}
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto a single in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it runs
+    await the same task and receive the same result or exception. The shared
+    task is shielded so a disconnecting caller does not cancel it for others.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        # A finished task stays registered until its done callback runs; never join it
+        if task is None or task.done():
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
@@ -8,6 +8,14 @@ load_dotenv()
 API_PORT = int(os.getenv('API_PORT', '5000'))
 API_HOST = os.getenv('API_HOST', '0.0.0.0')
 
+# Number of uvicorn worker processes. With more than one, auto-reload is off
+# and the comparison cache and /metrics are shared through SHARED_STATE_PATH
+# (SQLite); per-process limits such as COMPARE_MAX_IN_FLIGHT, JOB_WORKERS and
+# PARLANT_SESSION_POOL_SIZE then apply to each worker
+API_WORKERS = max(1, int(os.getenv('API_WORKERS', '1')))
+API_RELOAD = os.getenv('API_RELOAD', 'true' if API_WORKERS == 1 else 'false').lower() == 'true'
+SHARED_STATE_PATH = os.getenv('SHARED_STATE_PATH', 'data/shared_state.db' if API_WORKERS > 1 else '').strip()
+
 # Frontend Configuration
 FRONTEND_PORT = os.getenv('FRONTEND_PORT', '3300')
 FRONTEND_URL = os.getenv('FRONTEND_URL', f'http://localhost:{FRONTEND_PORT}')
@@ -37,12 +45,106 @@ PARLANT_BASE_URL = os.getenv('PARLANT_BASE_URL')
 if not PARLANT_BASE_URL:
     raise ValueError("PARLANT_BASE_URL environment variable is required. Please set it in your .env file.")
 
+# Optional agent ID override; by default it is read from parlant/parlant-data/agent_id.txt
+PARLANT_AGENT_ID = os.getenv('PARLANT_AGENT_ID')
+
 # OpenRouter Configuration
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'openai/gpt-4')
 OPENROUTER_HTTP_REFERER = os.getenv('OPENROUTER_HTTP_REFERER', 'https://github.com/yourusername/yourproject')
 OPENROUTER_X_TITLE = os.getenv('OPENROUTER_X_TITLE', 'Life Insurance Comparison Demo')
 
+# Comparison Configuration
+# "concurrent" runs the traditional and Parlant legs at the same time,
+# "sequential" runs the traditional leg first and then the Parlant leg
+COMPARE_MODE = os.getenv('COMPARE_MODE', 'concurrent').strip().lower()
+if COMPARE_MODE not in ('concurrent', 'sequential'):
+    raise ValueError("COMPARE_MODE must be either 'concurrent' or 'sequential'")
+# Maximum number of models one comparison may fan the traditional leg out to
+# with {"models": [...]}; each model is called concurrently
+COMPARE_MAX_MODELS = int(os.getenv('COMPARE_MAX_MODELS', '5'))
+# Comma-separated models a comparison may request besides OPENROUTER_MODEL;
+# requests for any other model are rejected, since they run on this server's key
+COMPARE_ALLOWED_MODELS = list(dict.fromkeys(
+    [OPENROUTER_MODEL] + [model.strip() for model in os.getenv('COMPARE_ALLOWED_MODELS', '').split(',') if model.strip()]
+))
+
+# Prompt Selection Configuration
+# "full" sends the whole traditional prompt on every call,
+# "selective" sends the compliance sections plus the PROMPT_TOP_K sections
+# most relevant to the query
+PROMPT_MODE = os.getenv('PROMPT_MODE', 'full').strip().lower()
+if PROMPT_MODE not in ('full', 'selective'):
+    raise ValueError("PROMPT_MODE must be either 'full' or 'selective'")
+PROMPT_TOP_K = int(os.getenv('PROMPT_TOP_K', '5'))
+
+# Parlant Session Pool Configuration
+# Number of fresh sessions kept ready per agent (0 disables the pool)
+# and the maximum age in seconds before an unused session is retired
+PARLANT_SESSION_POOL_SIZE = int(os.getenv('PARLANT_SESSION_POOL_SIZE', '4'))
+PARLANT_SESSION_MAX_AGE = float(os.getenv('PARLANT_SESSION_MAX_AGE', '300'))
+
+# Parlant Reply Configuration
+# Maximum number of seconds to wait for the agent to finish its turn
+PARLANT_REPLY_TIMEOUT = float(os.getenv('PARLANT_REPLY_TIMEOUT', '90'))
+
+# Comparison Cache Configuration
+# Maximum number of cached comparison results (0 disables the cache)
+# and how long in seconds a cached result stays valid
+COMPARE_CACHE_SIZE = int(os.getenv('COMPARE_CACHE_SIZE', '256'))
+COMPARE_CACHE_TTL = float(os.getenv('COMPARE_CACHE_TTL', '3600'))
+
+# Batch Comparison Configuration
+# Default and maximum number of comparisons a batch request runs at once,
+# and the maximum number of queries accepted per batch
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '32'))
+BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', '1000'))
+
+# Admission Control Configuration
+# At most COMPARE_MAX_IN_FLIGHT comparisons run at once (0 disables the limit);
+# up to COMPARE_MAX_QUEUE more wait up to COMPARE_QUEUE_TIMEOUT seconds for a
+# slot. Requests beyond that get 429 (queue full) or 503 (waited too long)
+# with a Retry-After header. Cache hits are never queued.
+COMPARE_MAX_IN_FLIGHT = int(os.getenv('COMPARE_MAX_IN_FLIGHT', '32'))
+COMPARE_MAX_QUEUE = int(os.getenv('COMPARE_MAX_QUEUE', '64'))
+COMPARE_QUEUE_TIMEOUT = float(os.getenv('COMPARE_QUEUE_TIMEOUT', '5'))
+# Batch items and jobs together hold at most this many of the in-flight slots,
+# so interactive requests always have the rest (default: three quarters)
+COMPARE_BACKGROUND_MAX_IN_FLIGHT = int(os.getenv('COMPARE_BACKGROUND_MAX_IN_FLIGHT', str(COMPARE_MAX_IN_FLIGHT * 3 // 4)))
+
+# Result Store Configuration
+# SQLite database (WAL mode) where every comparison is saved for the
+# history API; an empty path disables the store
+RESULT_STORE_PATH = os.getenv('RESULT_STORE_PATH', 'data/comparisons.db').strip()
+RESULT_STORE_BATCH_SIZE = int(os.getenv('RESULT_STORE_BATCH_SIZE', '100'))
+
+# Job Configuration
+# Comparison jobs (POST /api/jobs) are stored in this SQLite database so they
+# survive restarts; an empty path disables the job API. JOB_WORKERS jobs run
+# at once, at most JOB_MAX_PENDING may wait, and finished jobs are deleted
+# after JOB_RETENTION seconds. A job whose worker process died while running it
+# is retried until it has been started JOB_MAX_ATTEMPTS times, then marked failed
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', 'data/jobs.db').strip()
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '1000'))
+JOB_RETENTION = float(os.getenv('JOB_RETENTION', '86400'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+
+# Shutdown Configuration
+# On shutdown the server stops taking new jobs, then waits up to this many
+# seconds for running comparisons and jobs to finish before closing the
+# upstream connection pools
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', '20'))
+
+# Logging Configuration
+# LOG_FORMAT is "json" (one structured line per record) or "text"
+# LOG_SAMPLE_RATES keeps only a fraction of INFO records per category,
+# e.g. "cors=0.01,access=0.1" logs 1% of CORS and 10% of access records
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').strip().lower()
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', 'cors=0.01')
+
 # Demo Queries - Can be overridden via environment variable (JSON format)
 # Or use default queries below
 DEFAULT_DEMO_QUERIES = [
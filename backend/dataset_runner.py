@@ -0,0 +1,316 @@
+"""Concurrent, resumable comparison runner for large query datasets.
+
+Reads queries from a JSONL or CSV file, compares each one with bounded
+concurrency and appends one JSON line per finished query to the output file.
+The output file doubles as the checkpoint: rerunning with the same output
+skips every query that already has a successful result.
+
+Usage:
+    uv run dataset_runner.py queries.jsonl -o results.jsonl --concurrency 8
+    uv run dataset_runner.py queries.jsonl -o results.jsonl --models openai/gpt-4o,anthropic/claude-3.5-sonnet
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import pathlib
+import sys
+import time
+from typing import Iterator, Optional
+
+from traditional_llm_prompt import call_traditional_llm_with_usage, check_model, TraditionalLLMResult, TRADITIONAL_HUGE_PROMPT
+from result_store import ResultStore
+from http_pools import PARLANT_TIMEOUT, parlant_http_client
+
+# Add parlant directory to path to import parlant_client_utils
+parlant_dir = pathlib.Path(__file__).parent.parent / "parlant"
+sys.path.insert(0, str(parlant_dir))
+
+from parlant_client_utils import (
+    create_client as create_parlant_client,
+    send_user_message as send_parlant_user_message,
+    await_ai_reply as await_parlant_ai_reply,
+    get_session_reasoning as get_parlant_reasoning,
+    SessionPool,
+    SessionEventCollector,
+)
+
+
+def load_agent_id() -> str:
+    """Read the agent ID written by parlant_agent_server.py (or PARLANT_AGENT_ID)."""
+    from config import PARLANT_AGENT_ID
+    if PARLANT_AGENT_ID:
+        return PARLANT_AGENT_ID
+    agent_id_path = parlant_dir / "parlant-data" / "agent_id.txt"
+    if not agent_id_path.exists():
+        raise RuntimeError("agent_id.txt not found. Please start parlant/parlant_agent_server.py first.")
+    with open(agent_id_path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+async def compare_query(
+    client,
+    session_pool: SessionPool,
+    query: str,
+    reply_timeout: float = 90.0,
+    models: Optional[list[str]] = None,
+) -> dict:
+    """Run the traditional and Parlant legs for one query concurrently.
+
+    With ``models`` the traditional leg calls each of them at the same time;
+    the result lists them under ``"models"`` and its ``traditional_*`` fields
+    mirror the first one.
+    """
+
+    async def call_model(model: Optional[str]) -> tuple[TraditionalLLMResult, float]:
+        started = time.perf_counter()
+        result = await call_traditional_llm_with_usage(query, TRADITIONAL_HUGE_PROMPT, model)
+        return result, (time.perf_counter() - started) * 1000
+
+    async def traditional_leg() -> list[tuple[TraditionalLLMResult, float]]:
+        return await asyncio.gather(*(call_model(model) for model in models or [None]))
+
+    async def parlant_leg() -> tuple[str, str, float]:
+        started = time.perf_counter()
+        session_id = await session_pool.acquire()
+        customer_event_offset = await send_parlant_user_message(client, session_id, query)
+        min_offset = customer_event_offset + 1
+        collector = SessionEventCollector(client, session_id, min_offset)
+        response = await await_parlant_ai_reply(
+            client, session_id, min_offset, timeout=reply_timeout, collector=collector
+        ) or "Error: No AI reply received from Parlant session."
+        reasoning = await get_parlant_reasoning(client, session_id, min_offset, collector=collector)
+        return response, reasoning, (time.perf_counter() - started) * 1000
+
+    async with asyncio.TaskGroup() as tg:
+        traditional_task = tg.create_task(traditional_leg())
+        parlant_task = tg.create_task(parlant_leg())
+    traditional_results = traditional_task.result()
+    parlant_response, reasoning, parlant_ms = parlant_task.result()
+    traditional, traditional_ms = traditional_results[0]
+    result = {
+        "query": query,
+        "traditional_response": traditional.text,
+        "traditional_error": traditional.error,
+        "parlant_response": parlant_response,
+        "reasoning": reasoning,
+        "traditional_ms": round(traditional_ms, 1),
+        "parlant_ms": round(parlant_ms, 1),
+        "usage": traditional.usage(),
+    }
+    if models:
+        result["models"] = [
+            {
+                "model": model_result.model,
+                "response": model_result.text,
+                "error": model_result.error,
+                "latency_ms": round(model_ms, 1),
+                "usage": model_result.usage(),
+            }
+            for model_result, model_ms in traditional_results
+        ]
+    return result
+
+
+def open_result_store() -> Optional[ResultStore]:
+    """Open the configured result store, or return None when it is disabled."""
+    from config import RESULT_STORE_PATH, RESULT_STORE_BATCH_SIZE
+    return ResultStore(RESULT_STORE_PATH, batch_size=RESULT_STORE_BATCH_SIZE) if RESULT_STORE_PATH else None
+
+
+def save_result(store: Optional[ResultStore], result: dict, source: str) -> None:
+    """Queue a ``compare_query`` result for the result store, if one is open.
+
+    Multi-model results get one row per model; only the first counts the shared Parlant run.
+    """
+    if store is None:
+        return
+    models = result.get("models") or [{
+        "response": result["traditional_response"],
+        "error": result["traditional_error"],
+        "latency_ms": result["traditional_ms"],
+        "usage": result["usage"],
+    }]
+    for position, model in enumerate(models):
+        parlant_leg = position == 0
+        failed = model["error"] is not None or (parlant_leg and result["parlant_response"].startswith("Error"))
+        store.record(
+            result["query"],
+            model["response"],
+            result["parlant_response"],
+            result["reasoning"],
+            source=source,
+            status="error" if failed else "ok",
+            traditional_ms=model["latency_ms"],
+            parlant_ms=result["parlant_ms"],
+            usage=model["usage"],
+            prompt_mode="full",
+            parlant_leg=parlant_leg,
+        )
+
+
+def parse_models(value: Optional[str]) -> Optional[list[str]]:
+    """Split a comma-separated ``--models`` value, dropping blanks and duplicates.
+
+    Raises ``argparse.ArgumentTypeError`` for a model outside ``COMPARE_ALLOWED_MODELS``.
+    """
+    models = list(dict.fromkeys(model.strip() for model in (value or "").split(",") if model.strip()))
+    for model in models:
+        try:
+            check_model(model)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e)) from None
+    return models or None
+
+
+def iter_queries(path: pathlib.Path) -> Iterator[tuple[str, str]]:
+    """Yield ``(id, query)`` pairs from a JSONL or CSV file without loading it whole.
+
+    JSONL lines may be plain strings or objects with a ``query`` (and optional
+    ``id``) field. CSV files use the ``query``/``id`` columns, or the first
+    column when there is no ``query`` header. Rows without an ``id`` are
+    identified by their 1-based position in the file.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            reader = csv.reader(f)
+            header = next(reader, None) or []
+            columns = [column.strip().lower() for column in header]
+            if "query" in columns:
+                query_col = columns.index("query")
+                id_col = columns.index("id") if "id" in columns else None
+                rows = reader
+            else:
+                # No header row: the first column holds the query
+                query_col, id_col = 0, None
+                rows = itertools.chain([header], reader) if header else reader
+            for position, row in enumerate(rows, 1):
+                if len(row) > query_col and row[query_col].strip():
+                    row_id = row[id_col] if id_col is not None and len(row) > id_col and row[id_col] else str(position)
+                    yield row_id, row[query_col].strip()
+            return
+
+        for position, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield str(position), record.strip()
+            elif isinstance(record, dict) and record.get("query"):
+                yield str(record.get("id", position)), str(record["query"]).strip()
+
+
+def load_completed(output_path: pathlib.Path) -> set[str]:
+    """Return the IDs that already have a successful result in the output file."""
+    completed: set[str] = set()
+    if not output_path.exists():
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line; that query is simply redone
+                continue
+            if record.get("status") == "ok":
+                completed.add(str(record["id"]))
+    return completed
+
+
+async def run_dataset(
+    input_path: pathlib.Path,
+    output_path: pathlib.Path,
+    concurrency: int = 8,
+    limit: Optional[int] = None,
+    models: Optional[list[str]] = None,
+) -> dict:
+    """Compare every pending query in ``input_path`` and append results to ``output_path``."""
+    from config import PARLANT_SESSION_POOL_SIZE, PARLANT_SESSION_MAX_AGE, PARLANT_REPLY_TIMEOUT
+
+    completed = load_completed(output_path)
+    if completed:
+        print(f"↩️  Resuming: {len(completed)} queries already completed in {output_path}")
+
+    parlant_http = parlant_http_client()
+    client = await create_parlant_client(httpx_client=parlant_http, timeout=PARLANT_TIMEOUT)
+    session_pool = SessionPool(
+        client,
+        load_agent_id(),
+        size=concurrency if PARLANT_SESSION_POOL_SIZE else 0,
+        max_age=PARLANT_SESSION_MAX_AGE,
+    )
+    session_pool.start()
+    result_store = open_result_store()
+
+    queue: asyncio.Queue[Optional[tuple[str, str]]] = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"ok": 0, "error": 0, "skipped": len(completed)}
+    started = time.perf_counter()
+
+    async def produce() -> None:
+        queued = 0
+        for query_id, query in iter_queries(input_path):
+            if query_id in completed:
+                continue
+            if limit is not None and queued >= limit:
+                break
+            await queue.put((query_id, query))
+            queued += 1
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        async def work() -> None:
+            while (item := await queue.get()) is not None:
+                query_id, query = item
+                try:
+                    result = await compare_query(client, session_pool, query, reply_timeout=PARLANT_REPLY_TIMEOUT, models=models)
+                    record = {"id": query_id, "status": "ok", **result}
+                    save_result(result_store, result, source="dataset")
+                except Exception as e:
+                    if isinstance(e, ExceptionGroup):
+                        e = e.exceptions[0]
+                    record = {"id": query_id, "status": "error", "query": query, "error": f"{type(e).__name__}: {e}"}
+                # One line per query, flushed immediately so the file is always a valid checkpoint
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                counts[record["status"]] += 1
+                done = counts["ok"] + counts["error"]
+                icon = "✅" if record["status"] == "ok" else "❌"
+                print(f"{icon} [{done}] {query_id}: {query[:50]}")
+
+        try:
+            await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+        finally:
+            await session_pool.close()
+            await parlant_http.aclose()
+            if result_store is not None:
+                await result_store.close()
+
+    counts["elapsed_s"] = round(time.perf_counter() - started, 1)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Traditional LLM vs Parlant comparisons over a dataset.")
+    parser.add_argument("input", type=pathlib.Path, help="JSONL or CSV file of queries")
+    parser.add_argument("-o", "--output", type=pathlib.Path, required=True, help="JSONL file to append results to")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Comparisons to run at once (default: 8)")
+    parser.add_argument("--limit", type=int, default=None, help="Only run this many pending queries")
+    parser.add_argument(
+        "--models", type=parse_models, default=None,
+        help="Comma-separated OpenRouter models to compare (default: OPENROUTER_MODEL; others must be in COMPARE_ALLOWED_MODELS)",
+    )
+    args = parser.parse_args()
+
+    counts = asyncio.run(run_dataset(args.input, args.output, max(1, args.concurrency), args.limit, args.models))
+    print(
+        f"🏁 Done in {counts['elapsed_s']}s: {counts['ok']} ok, {counts['error']} failed, "
+        f"{counts['skipped']} skipped (already completed)"
+    )
+
+
+if __name__ == "__main__":
+    main()
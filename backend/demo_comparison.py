@@ -1,59 +1,63 @@
-"""Demo comparison between Traditional LLM and Parlant agent responses."""
+"""Demo comparison between Traditional LLM and Parlant agent responses.
+
+Usage:
+    uv run demo_comparison.py
+    uv run demo_comparison.py --models openai/gpt-4o,anthropic/claude-3.5-sonnet
+"""
+import argparse
 import asyncio
-from rich_table_formatter import print_comparison_rich
-from traditional_llm_prompt import call_traditional_llm as traditional_call, TRADITIONAL_HUGE_PROMPT
-import sys
-import pathlib
-
-# Add parlant directory to path to import parlant_client_utils
-parlant_dir = pathlib.Path(__file__).parent.parent / "parlant"
-sys.path.insert(0, str(parlant_dir))
-
-from parlant_client_utils import (
-    create_client as create_parlant_client,
-    create_session as create_parlant_session,
-    send_user_message as send_parlant_user_message,
-    await_ai_reply as await_parlant_ai_reply,
-    get_session_reasoning as get_parlant_reasoning,
-)
-
-
-async def main() -> None:
-    """Compare Traditional LLM vs Parlant agent responses."""
-    from config import DEMO_QUERIES
+from typing import Optional
+from rich_table_formatter import print_comparison_rich, print_model_table
+from http_pools import PARLANT_TIMEOUT, parlant_http_client
+from dataset_runner import compare_query, load_agent_id, create_parlant_client, open_result_store, parse_models, save_result, SessionPool
+
+
+async def main(models: Optional[list[str]] = None) -> None:
+    """Compare Traditional LLM vs Parlant agent responses, across ``models`` when given."""
+    from config import DEMO_QUERIES, PARLANT_SESSION_POOL_SIZE, PARLANT_SESSION_MAX_AGE, PARLANT_REPLY_TIMEOUT
     demo_queries = DEMO_QUERIES
 
-    import os
-    # parlant-data is now in parlant/ directory (root level)
-    parlant_dir = pathlib.Path(__file__).parent.parent / "parlant"
-    agent_id_path = parlant_dir / "parlant-data" / "agent_id.txt"
-    if not agent_id_path.exists():
-        raise RuntimeError("agent_id.txt not found. Please start parlant/parlant_agent_server.py first.")
-    with open(agent_id_path, "r", encoding="utf-8") as f:
-        agent_id = f.read().strip()
-
-    client = await create_parlant_client()
-    rows = []
-    
-    for i, query in enumerate(demo_queries, 1):
+    agent_id = load_agent_id()
+    parlant_http = parlant_http_client()
+    client = await create_parlant_client(httpx_client=parlant_http, timeout=PARLANT_TIMEOUT)
+    session_pool = SessionPool(
+        client,
+        agent_id,
+        size=min(PARLANT_SESSION_POOL_SIZE, len(demo_queries)),
+        max_age=PARLANT_SESSION_MAX_AGE,
+    )
+    session_pool.start()
+    result_store = open_result_store()
+
+    async def run(i: int, query: str) -> dict:
         print(f"🔄 Processing query {i}/{len(demo_queries)}: {query[:50]}...")
-        
-        session_id = await create_parlant_session(client, agent_id)
-        
-        print("  📝 Getting traditional LLM response...")
-        traditional_response = await traditional_call(query, TRADITIONAL_HUGE_PROMPT)
-        
-        print("  🤖 Getting Parlant agent response...")
-        customer_event_offset = await send_parlant_user_message(client, session_id, query)
-        min_offset = customer_event_offset + 1
-        parlant_response = await await_parlant_ai_reply(client, session_id, min_offset) or "Error: No AI reply received from Parlant session."
-        reasoning = await get_parlant_reasoning(client, session_id, min_offset)
-
-        print(f"  ✅ Query {i} complete")
-        rows.append([query, traditional_response, parlant_response, reasoning])
-
+        result = await compare_query(client, session_pool, query, reply_timeout=PARLANT_REPLY_TIMEOUT, models=models)
+        save_result(result_store, result, source="demo")
+        print(f"  ✅ Query {i} complete (traditional {result['traditional_ms']:.0f} ms, parlant {result['parlant_ms']:.0f} ms)")
+        usage = result["usage"]
+        if usage["total_tokens"] is not None:
+            print(f"  🔢 Traditional tokens: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion")
+        return result
+
+    # All demo queries run at once; gather keeps the results in query order
+    try:
+        results = await asyncio.gather(*(run(i, query) for i, query in enumerate(demo_queries, 1)))
+    finally:
+        await session_pool.close()
+        await parlant_http.aclose()
+        if result_store is not None:
+            await result_store.close()
+    rows = [[r["query"], r["traditional_response"], r["parlant_response"], r["reasoning"]] for r in results]
     print_comparison_rich([], rows)
+    if models:
+        print_model_table(results)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Compare Traditional LLM vs Parlant agent responses on the demo queries.")
+    parser.add_argument(
+        "--models", type=parse_models, default=None,
+        help="Comma-separated OpenRouter models to compare (default: OPENROUTER_MODEL; others must be in COMPARE_ALLOWED_MODELS)",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.models))
@@ -0,0 +1,84 @@
+"""Shared, tuned httpx connection pools for OpenRouter and Parlant.
+
+Both upstreams get explicit pool sizes, a keep-alive expiry long enough to
+survive gaps between bursts, and a short connect timeout separate from the
+read timeout. HTTP/2 is used when ``UPSTREAM_HTTP2`` is on and the ``h2``
+package is installed (``pip install "httpx[http2]"``); plain-HTTP upstreams
+such as a local Parlant server stay on HTTP/1.1 either way. When a cassette
+mode is set the pools sit behind the record/replay transport. ``warm_up``
+opens keep-alive connections before the first real request needs them.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+from cassette import CASSETTE_MODE, wrap_transport
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+HTTP2_ENABLED = UPSTREAM_HTTP2 and importlib.util.find_spec("h2") is not None
+# Idle keep-alive connections are closed after this many seconds (httpx defaults to 5)
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+# Connections opened per upstream at startup
+UPSTREAM_WARM_CONNECTIONS = int(os.getenv("UPSTREAM_WARM_CONNECTIONS", "2"))
+
+# Each comparison holds a Parlant connection for its long-poll, plus session pool refills
+PARLANT_MAX_CONNECTIONS = int(os.getenv("PARLANT_MAX_CONNECTIONS", "64"))
+PARLANT_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("PARLANT_MAX_KEEPALIVE_CONNECTIONS", "32"))
+PARLANT_TIMEOUT = float(os.getenv("PARLANT_TIMEOUT", "60"))
+
+
+def upstream_timeout(timeout: float) -> httpx.Timeout:
+    """Per-request timeout with the shorter connect timeout."""
+    return httpx.Timeout(timeout, connect=min(timeout, UPSTREAM_CONNECT_TIMEOUT))
+
+
+def upstream_transport(upstream: str, max_connections: int, max_keepalive_connections: int) -> httpx.AsyncBaseTransport:
+    """Pooled transport for one upstream, wrapped for record/replay when a cassette mode is set."""
+    return wrap_transport(upstream, httpx.AsyncHTTPTransport(
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+        ),
+    ))
+
+
+def parlant_http_client() -> httpx.AsyncClient:
+    """httpx client for ``AsyncParlantClient``; the caller closes it."""
+    return httpx.AsyncClient(
+        timeout=upstream_timeout(PARLANT_TIMEOUT),
+        transport=upstream_transport("parlant", PARLANT_MAX_CONNECTIONS, PARLANT_MAX_KEEPALIVE_CONNECTIONS),
+    )
+
+
+async def warm_up(client: httpx.AsyncClient, url: str, connections: int = UPSTREAM_WARM_CONNECTIONS) -> int:
+    """Open up to ``connections`` keep-alive connections to ``url`` and return how many succeeded.
+
+    Each connection is opened with a ``HEAD`` request; any HTTP status counts,
+    since only the TCP/TLS setup matters. Nothing is sent on replay.
+    """
+    if CASSETTE_MODE == "replay" or connections <= 0:
+        return 0
+    # A single HTTP/2 connection multiplexes every request
+    count = 1 if HTTP2_ENABLED and url.startswith("https://") else connections
+    results = await asyncio.gather(
+        *(client.head(url, timeout=UPSTREAM_CONNECT_TIMEOUT) for _ in range(count)),
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        logger.warning(
+            "Could not pre-open upstream connections",
+            extra={"category": "startup", "url": url, "failed": len(errors), "error_message": str(errors[0])},
+        )
+    return count - len(errors)
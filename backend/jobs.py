@@ -0,0 +1,381 @@
+"""Asynchronous comparison jobs backed by SQLite.
+
+``JobRunner.submit`` writes the job to the database before returning its id.
+Worker tasks claim the oldest queued job straight from the database, so any
+number of server processes can share one job store and each job runs once.
+A job moves from ``queued`` to ``running`` to ``done`` (with its result) or
+``failed`` (with an error message). A runner keeps a lease on the jobs it is
+running; jobs it gives back on shutdown, or whose lease expires because their
+process died, are queued again, so a restart loses no accepted work. Only the
+current lease holder can record a result, and a job that keeps losing its
+worker fails after ``max_attempts`` starts instead of being retried forever.
+"""
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import socket
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from admission import Overloaded
+from metrics import JOB_QUEUE_DEPTH, JOBS_FINISHED
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    query TEXT NOT NULL,
+    options TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    heartbeat_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created_at ON jobs (status, created_at);
+"""
+
+# Columns added after the first version of the table
+ADDED_COLUMNS = {"owner": "TEXT", "heartbeat_at": "REAL", "attempts": "INTEGER NOT NULL DEFAULT 0"}
+
+# Seconds between deletions of finished jobs older than the retention period
+PURGE_INTERVAL = 600.0
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 5000")
+    # With WAL, NORMAL still survives a process crash; only power loss can drop the last commits
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp is not None else None
+
+
+class JobStore:
+    """Durable job rows; every method is blocking and meant to run via ``asyncio.to_thread``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = _connect(path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        finally:
+            conn.close()
+
+    def _execute(self, sql: str, params: tuple = ()) -> tuple[list[sqlite3.Row], int]:
+        """Run one statement in its own transaction and return its rows and row count."""
+        # A connection per call keeps worker threads independent; WAL lets readers run alongside writes
+        conn = _connect(self.path)
+        try:
+            with conn:
+                cursor = conn.execute(sql, params)
+                return cursor.fetchall(), cursor.rowcount
+        finally:
+            conn.close()
+
+    def create(self, query: str, options: dict) -> str:
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, status, created_at, query, options) VALUES (?, 'queued', ?, ?, ?)",
+            (job_id, time.time(), query, json.dumps(options)),
+        )
+        return job_id
+
+    def claim_next(self, owner: str) -> Optional[dict]:
+        """Mark the oldest queued job as running for ``owner``, count the attempt and return the job, or None if none is queued."""
+        now = time.time()
+        # One UPDATE statement, so two processes can never claim the same job
+        rows, _ = self._execute(
+            """
+            UPDATE jobs SET status = 'running', owner = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1
+            WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1)
+              AND status = 'queued'
+            RETURNING id
+            """,
+            (owner, now, now),
+        )
+        return self.get(rows[0]["id"]) if rows else None
+
+    def heartbeat(self, owner: str) -> None:
+        """Extend the lease on every job ``owner`` is running."""
+        self._execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND owner = ?",
+            (time.time(), owner),
+        )
+
+    def finish(self, job_id: str, owner: str, result: dict) -> bool:
+        """Store the result of a job ``owner`` is running; False if its lease was lost."""
+        _, updated = self._execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, result = ? WHERE id = ? AND status = 'running' AND owner = ?",
+            (time.time(), json.dumps(result), job_id, owner),
+        )
+        return updated == 1
+
+    def fail(self, job_id: str, owner: str, error: str) -> bool:
+        """Mark a job ``owner`` is running as failed; False if its lease was lost."""
+        _, updated = self._execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ? AND status = 'running' AND owner = ?",
+            (time.time(), error, job_id, owner),
+        )
+        return updated == 1
+
+    def release(self, owner: str) -> int:
+        """Put the jobs ``owner`` was running back in the queue; a shutdown does not count as an attempt."""
+        _, released = self._execute(
+            """
+            UPDATE jobs SET status = 'queued', owner = NULL, started_at = NULL, attempts = max(attempts - 1, 0)
+            WHERE status = 'running' AND owner = ?
+            """,
+            (owner,),
+        )
+        return released
+
+    def requeue_expired(self, lease: float, max_attempts: int) -> tuple[int, int]:
+        """Handle running jobs whose owner has not renewed its lease for ``lease`` seconds.
+
+        Jobs started ``max_attempts`` times are marked failed, the rest are
+        queued again. Returns how many were requeued and how many failed.
+        """
+        expired_before = time.time() - lease
+        _, failed = self._execute(
+            """
+            UPDATE jobs SET status = 'failed', finished_at = ?, owner = NULL,
+                error = 'Job was interrupted ' || attempts || ' times and will not be retried'
+            WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?) AND attempts >= ?
+            """,
+            (time.time(), expired_before, max_attempts),
+        )
+        _, requeued = self._execute(
+            """
+            UPDATE jobs SET status = 'queued', owner = NULL, started_at = NULL
+            WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+            """,
+            (expired_before,),
+        )
+        return requeued, failed
+
+    def count_queued(self) -> int:
+        rows, _ = self._execute("SELECT COUNT(*) AS queued FROM jobs WHERE status = 'queued'")
+        return rows[0]["queued"]
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs that finished before ``older_than`` (a Unix timestamp)."""
+        _, deleted = self._execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (older_than,),
+        )
+        return deleted
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[dict]:
+        rows, _ = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        row = dict(rows[0])
+        job = {
+            "id": row["id"],
+            "status": row["status"],
+            "query": row["query"],
+            "options": json.loads(row["options"]),
+            "created_at": _iso(row["created_at"]),
+            "started_at": _iso(row["started_at"]),
+            "finished_at": _iso(row["finished_at"]),
+            "error": row["error"],
+            "attempts": row["attempts"],
+        }
+        if with_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+
+class JobRunner:
+    """Bounded pool of workers running stored jobs with ``run(query, options) -> result``.
+
+    Idle workers look for queued jobs every ``poll_interval`` seconds, or at
+    once when this process accepts a job. Running jobs are heartbeated every
+    third of ``lease``; a job whose lease lapses is requeued by any runner.
+    Finished jobs older than ``retention`` are deleted at startup and then
+    every ``PURGE_INTERVAL`` seconds.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        run: Callable[[str, dict], Awaitable[dict]],
+        workers: int = 4,
+        max_pending: int = 1000,
+        retention: float = 86400.0,
+        lease: float = 30.0,
+        poll_interval: float = 1.0,
+        max_attempts: int = 3,
+    ):
+        self.store = store
+        self.run = run
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.retention = retention
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, max_attempts)
+        # Identifies this process's leases in a store shared with other processes
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.queued = 0
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+        self._busy = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._wakeup = asyncio.Event()
+        self._purged_at = 0.0
+
+    async def start(self) -> None:
+        """Requeue jobs whose process died and start the workers."""
+        if self._tasks:
+            return
+        self._stopping = False
+        await self._purge()
+        await self._requeue_expired()
+        await self._refresh_queued()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self, timeout: float = 0.0) -> None:
+        """Stop taking jobs, give running ones up to ``timeout`` seconds, then cancel the workers.
+
+        Jobs that were cancelled are put back in the queue for this or another process.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if timeout > 0:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            except TimeoutError:
+                logger.warning(
+                    f"Cancelling {self._busy} running jobs at shutdown",
+                    extra={"category": "jobs"},
+                )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.store.release, self.owner)
+
+    async def submit(self, query: str, options: dict) -> str:
+        """Store a job and wake a worker; raises ``Overloaded`` when too many jobs are waiting."""
+        await self._refresh_queued()
+        if self.queued >= self.max_pending:
+            raise Overloaded(429, "job_queue_full", 30)
+        job_id = await asyncio.to_thread(self.store.create, query, options)
+        self.queued += 1
+        JOB_QUEUE_DEPTH.set(self.queued)
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str, with_result: bool = False) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id, with_result)
+
+    async def _refresh_queued(self) -> None:
+        self.queued = await asyncio.to_thread(self.store.count_queued)
+        JOB_QUEUE_DEPTH.set(self.queued)
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self.store.claim_next, self.owner)
+            except sqlite3.Error as e:
+                logger.error("Failed to claim a job", extra={"category": "jobs", "error_message": str(e)})
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except TimeoutError:
+                    pass
+                continue
+            self.queued = max(0, self.queued - 1)
+            JOB_QUEUE_DEPTH.set(self.queued)
+            self._busy += 1
+            self._idle.clear()
+            try:
+                await self._process(job)
+            except sqlite3.Error as e:
+                logger.error(
+                    "Failed to update job",
+                    extra={"category": "jobs", "job_id": job["id"], "error_message": str(e)},
+                )
+            finally:
+                self._busy -= 1
+                if not self._busy:
+                    self._idle.set()
+
+    async def _maintain(self) -> None:
+        """Renew this runner's leases, requeue expired ones, refresh the queue depth and purge old jobs."""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await asyncio.to_thread(self.store.heartbeat, self.owner)
+                if await self._requeue_expired():
+                    self._wakeup.set()
+                await self._refresh_queued()
+                if time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+                    await self._purge()
+            except sqlite3.Error as e:
+                logger.error("Failed to renew job leases", extra={"category": "jobs", "error_message": str(e)})
+
+    async def _requeue_expired(self) -> int:
+        requeued, failed = await asyncio.to_thread(self.store.requeue_expired, self.lease, self.max_attempts)
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted jobs", extra={"category": "jobs"})
+        if failed:
+            JOBS_FINISHED.inc(failed, status="failed")
+            logger.warning(
+                f"Failed {failed} jobs interrupted {self.max_attempts} times",
+                extra={"category": "jobs"},
+            )
+        return requeued
+
+    async def _purge(self) -> None:
+        self._purged_at = time.monotonic()
+        deleted = await asyncio.to_thread(self.store.purge, time.time() - self.retention)
+        if deleted:
+            logger.info(f"Deleted {deleted} finished jobs past retention", extra={"category": "jobs"})
+
+    async def _process(self, job: dict) -> None:
+        try:
+            result = await self.run(job["query"], job["options"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # HTTPException carries its user-facing message in ``detail``
+            stored = await asyncio.to_thread(self.store.fail, job["id"], self.owner, str(getattr(e, "detail", None) or e))
+            status = "failed"
+        else:
+            stored = await asyncio.to_thread(self.store.finish, job["id"], self.owner, result)
+            status = "done"
+        if not stored:
+            # The lease expired and the job was requeued or taken by another runner; its outcome wins
+            logger.warning("Discarding the outcome of a job whose lease was lost", extra={"category": "jobs", "job_id": job["id"]})
+            return
+        JOBS_FINISHED.inc(status=status)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "running": self._busy, "queued": self.queued, "max_pending": self.max_pending}
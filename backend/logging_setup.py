@@ -0,0 +1,122 @@
+"""Queue-backed, structured logging for the backend.
+
+Request handlers only put records on an in-memory queue; a background
+listener thread formats them as one-line JSON and writes them to stdout, so
+slow log I/O (PM2 writes stdout to disk synchronously) never blocks the event
+loop. Chatty categories can be sampled before they are queued, and records
+are dropped rather than blocking when the queue is full.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+# Attributes every LogRecord has; anything else was passed through ``extra=``
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+# Categories for third-party loggers that cannot pass ``extra={"category": ...}``
+LOGGER_CATEGORIES = {"uvicorn.access": "access", "httpx": "upstream_http"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single JSON line, including ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        elif record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records per category; warnings and errors always pass."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        category = getattr(record, "category", None) or LOGGER_CATEGORIES.get(record.name)
+        rate = self.rates.get(category)
+        return rate is None or random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking or raising."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now, but leave formatting to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    """Parse ``"cors=0.01,access=0.1"`` into ``{"cors": 0.01, "access": 0.1}``."""
+    rates: dict[str, float] = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        category, rate = item.split("=", 1)
+        try:
+            rates[category.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", sample_rates: Optional[dict[str, float]] = None, queue_size: int = 10000) -> None:
+    """Route the root logger through a bounded queue to a background stdout writer."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(SamplingFilter(sample_rates or {}))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,318 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms keep plain dicts keyed by label values, so
+recording a sample is a dict lookup and a few additions. The app runs on a
+single event loop, so no locking is needed. With several server processes,
+``SharedMetrics`` publishes each process's samples to SQLite and renders
+their sum (or, for gauges of state the processes share, their maximum).
+"""
+import copy
+import json
+import os
+import pathlib
+import socket
+import sqlite3
+import time
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+# Latency buckets in seconds, from fast cache hits up to long Parlant turns
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _label_values(labelnames: tuple[str, ...], labels: dict) -> tuple[str, ...]:
+    return tuple(str(labels.get(name, "")).replace('"', "'") for name in labelnames)
+
+
+class Counter:
+    """Monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_values(self.labelnames, labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, such as requests in flight.
+
+    A ``shared`` gauge measures state every process sees whole, such as a
+    queue in a shared database, so processes' values are not added up.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), shared: bool = False):
+        super().__init__(name, help_text, labelnames)
+        self.shared = shared
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[_label_values(self.labelnames, labels)] = value
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: "Histogram", labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (seconds by convention)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_values(self.labelnames, labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def time(self, **labels) -> _Timer:
+        """Context manager that observes the elapsed time of its block."""
+        return _Timer(self, labels)
+
+    def samples(self) -> list[str]:
+        lines: list[str] = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {self._sums[key]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together for the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, metrics: Optional[list] = None) -> str:
+        lines: list[str] = []
+        for metric in self._metrics if metrics is None else metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def _snapshot(metric) -> list:
+    """JSON-friendly copy of a metric's series."""
+    if isinstance(metric, Histogram):
+        return [[list(key), counts, metric._sums[key]] for key, counts in metric._counts.items()]
+    return [[list(key), value] for key, value in metric._values.items()]
+
+
+class SharedMetrics:
+    """Sum of a registry's metrics over every server process sharing a SQLite file.
+
+    Each process publishes its own samples under its host and pid. Counters,
+    gauges and histogram buckets are summed per series, except ``shared``
+    gauges, which take the highest value any process reported. A process that
+    has not published for ``stale_after`` seconds drops out of the totals, as
+    if it had restarted.
+    """
+
+    def __init__(self, path: str, registry: "Registry", stale_after: float = 60.0):
+        self.path = path
+        self.registry = registry
+        self.stale_after = stale_after
+        self.process = f"{socket.gethostname()}:{os.getpid()}"
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS metrics "
+                "(process TEXT PRIMARY KEY, published_at REAL NOT NULL, samples TEXT NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def snapshot(self) -> str:
+        """Serialize this process's samples; call on the event loop, which owns the metrics."""
+        return json.dumps({metric.name: _snapshot(metric) for metric in self.registry._metrics})
+
+    def publish(self, snapshot: str) -> None:
+        """Store this process's samples (blocking)."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO metrics (process, published_at, samples) VALUES (?, ?, ?)",
+                    (self.process, time.time(), snapshot),
+                )
+                # Rows of processes gone for an hour are never read again
+                conn.execute("DELETE FROM metrics WHERE published_at < ?", (time.time() - 3600,))
+        finally:
+            conn.close()
+
+    def render(self, snapshot: str) -> str:
+        """Publish ``snapshot`` and render the sum over all live processes (blocking)."""
+        self.publish(snapshot)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT samples FROM metrics WHERE published_at >= ?", (time.time() - self.stale_after,)
+            ).fetchall()
+        finally:
+            conn.close()
+        published = [json.loads(row[0]) for row in rows]
+        merged = []
+        for metric in self.registry._metrics:
+            total = copy.copy(metric)
+            if isinstance(metric, Histogram):
+                total._counts, total._sums = {}, {}
+                for samples in published:
+                    for key, counts, value_sum in samples.get(metric.name, ()):
+                        key = tuple(key)
+                        current = total._counts.setdefault(key, [0] * len(counts))
+                        total._counts[key] = [a + b for a, b in zip(current, counts)]
+                        total._sums[key] = total._sums.get(key, 0.0) + value_sum
+            else:
+                total._values = {}
+                shared = getattr(metric, "shared", False)
+                for samples in published:
+                    for key, value in samples.get(metric.name, ()):
+                        key = tuple(key)
+                        current = total._values.get(key)
+                        if current is None:
+                            total._values[key] = value
+                        else:
+                            total._values[key] = max(current, value) if shared else current + value
+            merged.append(total)
+        return self.registry.render(merged)
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "compare_stage_duration_seconds",
+    "Duration of each comparison stage (traditional_llm, traditional_first_token, session_create, send_message, await_reply, reasoning).",
+    labelnames=("stage",),
+))
+COMPARE_LATENCY = REGISTRY.register(Histogram(
+    "compare_request_duration_seconds",
+    "End-to-end duration of /api/compare requests by outcome (ok, cached, rejected, cancelled, error).",
+    labelnames=("outcome",),
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "compare_requests_in_flight",
+    "/api/compare requests currently being processed.",
+))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "upstream_errors_total",
+    "Errors returned by upstream services.",
+    labelnames=("upstream", "error_type"),
+))
+PROMPT_TOKENS_SAVED = REGISTRY.register(Counter(
+    "prompt_tokens_saved_total",
+    "Estimated system prompt tokens not sent because of selective prompt mode.",
+))
+TRADITIONAL_TOKENS = REGISTRY.register(Counter(
+    "traditional_llm_tokens_total",
+    "Traditional LLM tokens by model and kind (prompt and completion as reported, estimated_input computed locally).",
+    labelnames=("model", "kind"),
+))
+TRADITIONAL_COST = REGISTRY.register(Counter(
+    "traditional_llm_cost_total",
+    "Traditional LLM cost in credits as reported by OpenRouter.",
+    labelnames=("model",),
+))
+OPENROUTER_HEDGES = REGISTRY.register(Counter(
+    "openrouter_hedged_requests_total",
+    "Backup OpenRouter attempts started because the first attempt was slower than the hedge delay.",
+))
+CIRCUIT_REJECTIONS = REGISTRY.register(Counter(
+    "circuit_breaker_rejections_total",
+    "Upstream calls failed fast because the circuit breaker was open.",
+    labelnames=("upstream",),
+))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "admission_in_flight",
+    "Comparisons currently holding an admission slot.",
+))
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "admission_queue_depth",
+    "Interactive comparisons waiting for an admission slot.",
+))
+ADMISSION_PATIENT_WAITING = REGISTRY.register(Gauge(
+    "admission_patient_waiting",
+    "Batch items and jobs waiting for an admission slot (not limited by the queue).",
+))
+ADMISSION_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "admission_queue_wait_seconds",
+    "Time comparisons waited for an admission slot (0 when one was free).",
+))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "admission_rejections_total",
+    "Comparisons rejected by admission control (queue_full -> 429, queue_timeout -> 503).",
+    labelnames=("reason",),
+))
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "job_queue_depth",
+    "Comparison jobs waiting for a job worker.",
+    # Every process counts the same shared jobs table
+    shared=True,
+))
+JOBS_FINISHED = REGISTRY.register(Counter(
+    "jobs_finished_total",
+    "Comparison jobs finished by status (done, failed).",
+    labelnames=("status",),
+))
@@ -0,0 +1,153 @@
+"""Relevance-based section selection for the traditional monolithic prompt.
+
+The prompt is split into its numbered sections and indexed with BM25 over a
+simple local tokenizer (no network, no extra dependencies). For each query
+the always-on compliance sections are kept along with the top-k most relevant
+sections, in their original order, between the prompt's preamble and closing.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+# Sections whose titles contain these words are included for every query
+ALWAYS_ON_KEYWORDS = ("COMPLIANCE", "RED FLAGS")
+
+_SECTION_HEADER = re.compile(r"^\s*(\d+[A-Z]?)\.\s+([A-Z][A-Z0-9 /&()'-]+):\s*$")
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from have how i if in into is it its me my of on or "
+    "our should so than that the their them then there these they this to was we what when which who "
+    "will with you your about also any all just not no".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English prompt text (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens with stopwords removed and light plural stemming."""
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+@dataclass
+class PromptSection:
+    number: str
+    title: str
+    text: str
+    always_on: bool = False
+
+
+@dataclass
+class SelectedPrompt:
+    text: str
+    sections: list[str] = field(default_factory=list)
+    prompt_tokens: int = 0
+    full_prompt_tokens: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.full_prompt_tokens - self.prompt_tokens
+
+
+def split_sections(prompt: str) -> tuple[str, list[PromptSection], str]:
+    """Split a prompt into its preamble, numbered sections and closing ``Remember:`` paragraph."""
+    lines = prompt.strip("\n").split("\n")
+    preamble: list[str] = []
+    closing: list[str] = []
+    sections: list[PromptSection] = []
+    current: list[str] = []
+    header = None
+
+    def flush() -> None:
+        if header is not None:
+            number, title = header
+            sections.append(PromptSection(
+                number=number,
+                title=title,
+                text="\n".join(current).rstrip(),
+                always_on=any(keyword in title for keyword in ALWAYS_ON_KEYWORDS),
+            ))
+
+    for line in lines:
+        if closing or line.startswith("Remember:"):
+            closing.append(line)
+            continue
+        match = _SECTION_HEADER.match(line)
+        if match:
+            flush()
+            header = (match.group(1), match.group(2).strip())
+            current = [line]
+        elif header is None:
+            preamble.append(line)
+        else:
+            current.append(line)
+    flush()
+    return "\n".join(preamble).rstrip(), sections, "\n".join(closing).strip()
+
+
+class BM25Index:
+    """Okapi BM25 over a small, fixed set of documents."""
+
+    def __init__(self, documents: list[list[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(doc) for doc in documents]
+        self.lengths = [len(doc) for doc in documents]
+        self.avg_length = sum(self.lengths) / len(documents) if documents else 0.0
+        document_frequency: Counter = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query_tokens: list[str]) -> list[float]:
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in set(query_tokens):
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+class PromptSelector:
+    """Build per-query prompts from the always-on sections plus the top-k relevant ones."""
+
+    def __init__(self, prompt: str, top_k: int = 5):
+        self.top_k = top_k
+        self.preamble, self.sections, self.closing = split_sections(prompt)
+        self.full_prompt_tokens = estimate_tokens(prompt)
+        # Titles are repeated so a match on the heading outweighs a passing mention
+        self.index = BM25Index([tokenize(f"{s.title} {s.title} {s.text}") for s in self.sections])
+
+    def select(self, query: str) -> SelectedPrompt:
+        scores = self.index.scores(tokenize(query))
+        ranked = sorted(
+            (i for i, s in enumerate(self.sections) if not s.always_on and scores[i] > 0),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+        chosen = set(ranked[: self.top_k]) | {i for i, s in enumerate(self.sections) if s.always_on}
+        selected = [self.sections[i] for i in sorted(chosen)]
+        text = "\n\n".join(part for part in (self.preamble, *(s.text for s in selected), self.closing) if part)
+        return SelectedPrompt(
+            text=text,
+            sections=[f"{s.number}. {s.title}" for s in selected],
+            prompt_tokens=estimate_tokens(text),
+            full_prompt_tokens=self.full_prompt_tokens,
+        )
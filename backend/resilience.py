@@ -0,0 +1,142 @@
+"""Tail-latency and failure handling for upstream calls.
+
+``hedged`` starts a backup attempt when the first one is slower than a delay
+and returns whichever succeeds first, cancelling the rest. ``LatencyWindow``
+keeps recent call durations so that delay can track a percentile.
+``CircuitBreaker`` fails calls fast while an upstream keeps failing and lets a
+single probe through after a cooldown. Everything runs on one event loop, so
+no locking is needed.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is temporarily unavailable after repeated failures; retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open after ``cooldown`` seconds.
+
+    While open every call is rejected. Half-open lets one probe call through:
+    success closes the circuit, failure opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        """Raise ``CircuitOpenError`` unless a call may go through now."""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return
+        raise CircuitOpenError(self.name, self.retry_in())
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.probe_in_flight or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Forget an unfinished probe (e.g. the caller was cancelled) so another can run."""
+        self.probe_in_flight = False
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_s": round(self.retry_in(), 1),
+        }
+
+
+class LatencyWindow:
+    """Durations of the most recent successful calls, for percentile-based hedge delays."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples: deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the ``q`` quantile, or None until ``min_samples`` calls have been seen."""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+async def hedged(
+    attempt: Callable[[], Awaitable[T]],
+    delay: float,
+    max_hedges: int = 1,
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> T:
+    """Run ``attempt``, starting up to ``max_hedges`` more copies ``delay`` seconds apart.
+
+    The first attempt to succeed wins and the others are cancelled. If every
+    started attempt fails, the first failure is raised. ``on_hedge`` is called
+    each time a backup attempt is started.
+    """
+    tasks = [asyncio.create_task(attempt())]
+    errors: list[BaseException] = []
+    try:
+        while True:
+            pending = [task for task in tasks if not task.done()]
+            can_hedge = len(tasks) <= max_hedges
+            if not pending:
+                raise errors[0]
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=delay if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                tasks.append(asyncio.create_task(attempt()))
+                if on_hedge is not None:
+                    on_hedge()
+                continue
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                errors.append(task.exception())
+    finally:
+        for task in tasks:
+            task.cancel()
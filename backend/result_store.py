@@ -0,0 +1,340 @@
+"""Persistent SQLite store for comparison results.
+
+Callers hand results to ``record`` which only puts a row on an in-memory
+queue; a background task drains the queue and writes whatever has
+accumulated in one transaction on a worker thread, so requests never wait on
+disk I/O. The database runs in WAL mode so history reads don't block writes.
+
+A multi-model comparison is stored as one row per model. Only the first row
+has ``parlant_leg = 1``, so the shared Parlant run is counted once in reports.
+"""
+import asyncio
+import logging
+import pathlib
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from comparison_cache import fingerprint, normalize_query
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "created_at",
+    "source",
+    "status",
+    "query",
+    "query_hash",
+    "model",
+    "prompt_hash",
+    "prompt_mode",
+    "traditional_response",
+    "parlant_response",
+    "reasoning",
+    "traditional_ms",
+    "parlant_ms",
+    "total_ms",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "cost",
+    "estimated_prompt_tokens",
+    "parlant_leg",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comparisons (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    query TEXT NOT NULL,
+    query_hash TEXT NOT NULL,
+    model TEXT,
+    prompt_hash TEXT,
+    prompt_mode TEXT,
+    traditional_response TEXT,
+    parlant_response TEXT,
+    reasoning TEXT,
+    traditional_ms REAL,
+    parlant_ms REAL,
+    total_ms REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    cost REAL,
+    estimated_prompt_tokens INTEGER,
+    parlant_leg INTEGER NOT NULL DEFAULT 1
+);
+-- SQLite appends the rowid to every index, so these also serve ORDER BY id
+CREATE INDEX IF NOT EXISTS idx_comparisons_created_at ON comparisons (created_at);
+CREATE INDEX IF NOT EXISTS idx_comparisons_query_hash ON comparisons (query_hash);
+CREATE INDEX IF NOT EXISTS idx_comparisons_model ON comparisons (model);
+
+-- Narrow per-comparison numbers for analytics, so reports never read response text
+CREATE TABLE IF NOT EXISTS comparison_stats (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    model TEXT,
+    prompt_hash TEXT,
+    traditional_ms REAL,
+    parlant_ms REAL,
+    total_ms REAL,
+    traditional_chars INTEGER,
+    parlant_chars INTEGER,
+    tools TEXT NOT NULL DEFAULT '',
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cost REAL,
+    parlant_leg INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_comparison_stats_created_at ON comparison_stats (created_at);
+CREATE INDEX IF NOT EXISTS idx_comparison_stats_model ON comparison_stats (model);
+CREATE INDEX IF NOT EXISTS idx_comparison_stats_prompt_hash ON comparison_stats (prompt_hash);
+"""
+
+STATS_COLUMNS = (
+    "id",
+    "created_at",
+    "source",
+    "status",
+    "model",
+    "prompt_hash",
+    "traditional_ms",
+    "parlant_ms",
+    "total_ms",
+    "traditional_chars",
+    "parlant_chars",
+    "tools",
+    "prompt_tokens",
+    "completion_tokens",
+    "cost",
+    "parlant_leg",
+)
+
+# Columns added to both tables after their first version
+ADDED_COLUMNS = {"parlant_leg": "INTEGER NOT NULL DEFAULT 1"}
+
+# Fills comparison_stats for rows written before the table existed
+BACKFILL_STATS = f"""
+INSERT INTO comparison_stats ({", ".join(STATS_COLUMNS)})
+SELECT id, created_at, source, status, model, prompt_hash, traditional_ms, parlant_ms, total_ms,
+       length(traditional_response), length(parlant_response),
+       CASE WHEN instr(reasoning, 'Tools: ') > 0 THEN substr(reasoning, instr(reasoning, 'Tools: ') + 7) ELSE '' END,
+       prompt_tokens, completion_tokens, cost, parlant_leg
+FROM comparisons
+WHERE id > (SELECT coalesce(max(id), 0) FROM comparison_stats)
+"""
+
+
+def query_hash(query: str) -> str:
+    """Hash of the normalized query, shared by spellings the cache treats as equal."""
+    return fingerprint(normalize_query(query))
+
+
+def tools_from_reasoning(reasoning: str) -> str:
+    """Return the comma-separated tool list from a ``get_session_reasoning`` summary."""
+    _, found, tools = reasoning.partition("Tools: ")
+    return tools.split(" | ", 1)[0].strip() if found else ""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 5000")
+    return conn
+
+
+class ResultStore:
+    """Append-only comparison history with batched background writes."""
+
+    def __init__(self, path: str, batch_size: int = 100, max_pending: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = _connect(path)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(SCHEMA)
+        with self._conn:
+            for table in ("comparisons", "comparison_stats"):
+                existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for column, kind in ADDED_COLUMNS.items():
+                    if column not in existing:
+                        self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+            self._conn.execute(BACKFILL_STATS)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._writer: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def record(
+        self,
+        query: str,
+        traditional_response: str,
+        parlant_response: str,
+        reasoning: str,
+        *,
+        source: str,
+        status: str = "ok",
+        traditional_ms: Optional[float] = None,
+        parlant_ms: Optional[float] = None,
+        total_ms: Optional[float] = None,
+        usage: Optional[dict] = None,
+        prompt_hash: Optional[str] = None,
+        prompt_mode: Optional[str] = None,
+        parlant_leg: bool = True,
+    ) -> None:
+        """Queue one comparison for writing; drops it if the queue is full.
+
+        Pass ``parlant_leg=False`` for the extra rows of a multi-model
+        comparison, whose Parlant run is already counted by its first row.
+        """
+        usage = usage or {}
+        row = (
+            time.time(),
+            source,
+            status,
+            query,
+            query_hash(query),
+            usage.get("model"),
+            prompt_hash or usage.get("prompt_fingerprint"),
+            prompt_mode,
+            traditional_response,
+            parlant_response,
+            reasoning,
+            traditional_ms,
+            parlant_ms,
+            total_ms,
+            usage.get("prompt_tokens"),
+            usage.get("completion_tokens"),
+            usage.get("total_tokens"),
+            usage.get("cost"),
+            usage.get("estimated_prompt_tokens"),
+            int(parlant_leg),
+        )
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop())
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _write_loop(self) -> None:
+        while True:
+            row = await self._queue.get()
+            if row is None:
+                return
+            batch = [row]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                row = self._queue.get_nowait()
+                if row is None:
+                    await self._write_batch(batch)
+                    return
+                batch.append(row)
+            await self._write_batch(batch)
+
+    async def _write_batch(self, batch: list[tuple]) -> None:
+        try:
+            await asyncio.to_thread(self._insert, batch)
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            self.failed += len(batch)
+            logger.error(
+                "Failed to write comparison results",
+                extra={"category": "result_store", "rows": len(batch), "error_message": str(e)},
+            )
+
+    def _insert(self, batch: list[tuple]) -> None:
+        columns = {name: position for position, name in enumerate(COLUMNS)}
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        stats_placeholders = ", ".join("?" for _ in STATS_COLUMNS)
+        with self._conn:
+            for row in batch:
+                cursor = self._conn.execute(
+                    f"INSERT INTO comparisons ({', '.join(COLUMNS)}) VALUES ({placeholders})", row
+                )
+                values = {name: row[position] for name, position in columns.items()}
+                values["id"] = cursor.lastrowid
+                values["traditional_chars"] = len(values["traditional_response"] or "")
+                values["parlant_chars"] = len(values["parlant_response"] or "")
+                values["tools"] = tools_from_reasoning(values["reasoning"] or "")
+                self._conn.execute(
+                    f"INSERT INTO comparison_stats ({', '.join(STATS_COLUMNS)}) VALUES ({stats_placeholders})",
+                    [values[name] for name in STATS_COLUMNS],
+                )
+
+    async def close(self) -> None:
+        """Write everything still queued and close the database."""
+        if self._writer is not None and not self._writer.done():
+            await self._queue.put(None)
+            await self._writer
+        self._conn.close()
+
+    async def history(
+        self,
+        limit: int = 50,
+        before_id: Optional[int] = None,
+        model: Optional[str] = None,
+        query: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> list[dict]:
+        """Return the newest comparisons first, optionally filtered.
+
+        Pages are keyed on ``id``: pass the last ``id`` of a page as
+        ``before_id`` to get the next one. ``query`` matches on the normalized
+        query hash and ``since``/``until`` are Unix timestamps.
+        """
+        clauses: list[str] = []
+        params: list = []
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        if query:
+            clauses.append("query_hash = ?")
+            params.append(query_hash(query))
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT * FROM comparisons {where} ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return await asyncio.to_thread(self._select, sql, params)
+
+    async def get(self, comparison_id: int) -> Optional[dict]:
+        rows = await asyncio.to_thread(self._select, "SELECT * FROM comparisons WHERE id = ?", [comparison_id])
+        return rows[0] if rows else None
+
+    def _select(self, sql: str, params: list) -> list[dict]:
+        # A connection per read keeps readers off the writer's connection; WAL lets them run concurrently
+        conn = _connect(self.path)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        results = []
+        for row in rows:
+            item = dict(row)
+            item["created_at"] = datetime.fromtimestamp(item["created_at"], timezone.utc).isoformat()
+            results.append(item)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -169,3 +169,48 @@ def print_comparison_rich(headers: list[str], rows: list[list[str]]) -> None:
         )
     
     console.print(table)
+
+
+def print_model_table(results: list[dict]) -> None:
+    """Render per-model latency, token usage and cost for multi-model comparisons.
+
+    ``results`` are ``compare_query`` results that carry a ``"models"`` list.
+    """
+    console = Console()
+    table = Table(
+        title="⏱️ Traditional LLM: Latency vs Quality by Model",
+        box=box.ROUNDED,
+        show_header=True,
+        header_style="bold magenta",
+        title_style="bold blue",
+        show_lines=True
+    )
+    table.add_column("📝 Query", style="cyan", width=30, no_wrap=False, overflow="fold")
+    table.add_column("🤖 Model", style="bold", width=24, no_wrap=False, overflow="fold")
+    table.add_column("⏱️ Latency (ms)", justify="right", width=10)
+    table.add_column("🔢 Tokens (in/out)", justify="right", width=14)
+    table.add_column("💰 Cost", justify="right", width=10)
+    table.add_column("💬 Response", style="dim", width=60, no_wrap=False, overflow="fold")
+
+    for result in results:
+        for model in result.get("models") or []:
+            usage = model["usage"]
+            tokens = (
+                f"{usage['prompt_tokens']}/{usage['completion_tokens']}"
+                if usage["total_tokens"] is not None
+                else "[dim]n/a[/dim]"
+            )
+            cost = f"${usage['cost']:.4f}" if usage.get("cost") is not None else "[dim]n/a[/dim]"
+            response = model["response"] or ""
+            if model["error"] is not None:
+                response = f"[red]{model['error']}[/red]: {response}"
+            table.add_row(
+                result["query"][:80],
+                model["model"],
+                f"{model['latency_ms']:.0f}",
+                tokens,
+                cost,
+                response[:300] + ("..." if len(response) > 300 else ""),
+            )
+
+    console.print(table)
@@ -1,24 +1,106 @@
+import asyncio
 import os
+import time
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Optional
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from cassette import CASSETTE_MODE
+from http_pools import upstream_timeout, upstream_transport
+from comparison_cache import fingerprint
+from metrics import UPSTREAM_ERRORS, TRADITIONAL_TOKENS, TRADITIONAL_COST, OPENROUTER_HEDGES, CIRCUIT_REJECTIONS
+from prompt_selection import estimate_tokens
+from resilience import CircuitBreaker, CircuitOpenError, LatencyWindow, hedged
 
 load_dotenv()
 
 # OpenRouter API Configuration
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+if not OPENROUTER_API_KEY and CASSETTE_MODE == "replay":
+    # Replays never reach OpenRouter, so they run without a real key
+    OPENROUTER_API_KEY = "replay"
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "openai/gpt-4")  # Default to GPT-4 via OpenRouter
+# Models callers may pick instead of OPENROUTER_MODEL; any other model is refused before a call is made
+ALLOWED_MODELS = frozenset(
+    [OPENROUTER_MODEL] + [model.strip() for model in os.getenv("COMPARE_ALLOWED_MODELS", "").split(",") if model.strip()]
+)
 
-# Initialize OpenRouter client (uses OpenAI SDK with OpenRouter base URL)
-openai_client = OpenAI(
+# Connection pool and concurrency limits for OpenRouter calls
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20"))
+OPENROUTER_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_KEEPALIVE_CONNECTIONS", "10"))
+OPENROUTER_MAX_CONCURRENCY = int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "10"))
+OPENROUTER_TIMEOUT = float(os.getenv("OPENROUTER_TIMEOUT", "60"))
+
+# Overall time budget for one traditional LLM call, including retries and hedges
+OPENROUTER_DEADLINE = float(os.getenv("OPENROUTER_DEADLINE", "45"))
+
+# Hedging: when a call takes longer than the OPENROUTER_HEDGE_QUANTILE of recent
+# call durations (OPENROUTER_HEDGE_DELAY until enough calls have been seen, and
+# never less than OPENROUTER_HEDGE_MIN_DELAY), start another attempt and keep
+# whichever finishes first. OPENROUTER_MAX_HEDGES=0 disables hedging.
+OPENROUTER_MAX_HEDGES = int(os.getenv("OPENROUTER_MAX_HEDGES", "1"))
+OPENROUTER_HEDGE_QUANTILE = float(os.getenv("OPENROUTER_HEDGE_QUANTILE", "0.95"))
+OPENROUTER_HEDGE_DELAY = float(os.getenv("OPENROUTER_HEDGE_DELAY", "10"))
+OPENROUTER_HEDGE_MIN_DELAY = float(os.getenv("OPENROUTER_HEDGE_MIN_DELAY", "1"))
+
+# Circuit breaker: after this many consecutive failed calls, fail fast for the
+# cooldown (seconds), then let a single probe call decide whether to recover
+OPENROUTER_BREAKER_FAILURES = int(os.getenv("OPENROUTER_BREAKER_FAILURES", "5"))
+OPENROUTER_BREAKER_COOLDOWN = float(os.getenv("OPENROUTER_BREAKER_COOLDOWN", "30"))
+
+# Initialize async OpenRouter client (uses OpenAI SDK with OpenRouter base URL)
+# The shared httpx pool (see http_pools) is capped so bursts of comparisons reuse keep-alive
+# connections; the API server pre-opens it at startup and closes it on shutdown
+# When CASSETTE_MODE is set, requests are recorded to or replayed from a cassette file
+openrouter_http_client = DefaultAsyncHttpxClient(
+    transport=upstream_transport("openrouter", OPENROUTER_MAX_CONNECTIONS, OPENROUTER_MAX_KEEPALIVE_CONNECTIONS),
+    timeout=upstream_timeout(OPENROUTER_TIMEOUT),
+)
+openai_client = AsyncOpenAI(
     api_key=OPENROUTER_API_KEY,
     base_url=OPENROUTER_BASE_URL,
     default_headers={
         "HTTP-Referer": os.getenv("OPENROUTER_HTTP_REFERER", "https://github.com/yourusername/yourproject"),
         "X-Title": os.getenv("OPENROUTER_X_TITLE", "Life Insurance Comparison Demo"),
-    }
+    },
+    # The SDK sends its own timeout with every request, so it must carry the connect timeout too
+    timeout=upstream_timeout(OPENROUTER_TIMEOUT),
+    http_client=openrouter_http_client,
 )
 
+# Caps how many traditional LLM calls may be in flight at once
+openrouter_semaphore = asyncio.Semaphore(OPENROUTER_MAX_CONCURRENCY)
+openrouter_breaker = CircuitBreaker("OpenRouter", OPENROUTER_BREAKER_FAILURES, OPENROUTER_BREAKER_COOLDOWN)
+# Durations of recent successful (non-streamed) attempts, for the hedge delay
+openrouter_latency = LatencyWindow()
+# Other models requested per comparison get their own breaker and latency window,
+# so one slow or unavailable model does not affect the default one
+model_breakers: dict[str, CircuitBreaker] = {OPENROUTER_MODEL: openrouter_breaker}
+model_latencies: dict[str, LatencyWindow] = {OPENROUTER_MODEL: openrouter_latency}
+
+
+def check_model(model: str) -> None:
+    """Raise ``ValueError`` unless ``model`` is OPENROUTER_MODEL or listed in COMPARE_ALLOWED_MODELS."""
+    if model not in ALLOWED_MODELS:
+        raise ValueError(f"Model {model!r} is not allowed; add it to COMPARE_ALLOWED_MODELS")
+
+
+def breaker_for(model: str) -> CircuitBreaker:
+    """Circuit breaker for an allowed ``model``, created on first use."""
+    if model not in model_breakers:
+        check_model(model)
+        model_breakers[model] = CircuitBreaker(f"OpenRouter ({model})", OPENROUTER_BREAKER_FAILURES, OPENROUTER_BREAKER_COOLDOWN)
+    return model_breakers[model]
+
+
+def latency_for(model: str) -> LatencyWindow:
+    """Recent call durations for an allowed ``model``, created on first use."""
+    if model not in model_latencies:
+        check_model(model)
+        model_latencies[model] = LatencyWindow()
+    return model_latencies[model]
+
 
 TRADITIONAL_HUGE_PROMPT = """
 You are a professional life insurance agent assistant named InsuranceBot. Your role is to help customers understand life insurance policies and guide them through the selection process.
@@ -237,22 +319,226 @@ CRITICAL INSTRUCTIONS - READ CAREFULLY:
 Remember: Your goal is to educate customers and help them make informed decisions. Be helpful, accurate, and always prioritize the customer's best interests. Follow these instructions EXACTLY and CONSISTENTLY for every customer interaction. Remember ALL 23 SECTIONS of guidance at ALL times.
 """
 
-
-async def call_traditional_llm(query: str, prompt: str) -> str:
-    """Call traditional LLM with the given query and prompt using OpenRouter."""
-    try:
-        if not OPENROUTER_API_KEY:
-            return "Error: OPENROUTER_API_KEY not found. Please set it in your .env file."
-        
-        response = openai_client.chat.completions.create(
-            model=OPENROUTER_MODEL,
+# Identifies the prompt version behind a result; computed once since the prompt is fixed
+PROMPT_FINGERPRINT = fingerprint(TRADITIONAL_HUGE_PROMPT)
+PROMPT_ESTIMATED_TOKENS = estimate_tokens(TRADITIONAL_HUGE_PROMPT)
+
+
+@dataclass
+class TraditionalLLMResult:
+    """Response text plus token accounting for one traditional LLM call.
+
+    ``prompt_tokens``, ``completion_tokens``, ``total_tokens`` and ``cost``
+    come from the provider and are ``None`` when the call failed or the
+    provider did not report them; the ``estimated_*`` counts are computed
+    locally before the call. When the call fails, ``error`` is set to one of
+    ``missing_api_key``, ``circuit_open``, ``deadline_exceeded`` or
+    ``upstream_error`` and ``text`` holds a readable error message.
+    """
+    text: str
+    model: str
+    prompt_fingerprint: str
+    estimated_prompt_tokens: int
+    estimated_query_tokens: int
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    cost: Optional[float] = None
+    error: Optional[str] = None
+
+    def usage(self) -> dict:
+        """Token counts and cost as a plain dict (without the response text or error)."""
+        data = asdict(self)
+        del data["text"]
+        del data["error"]
+        return data
+
+
+def start_traditional_result(query: str, prompt: str, model: Optional[str] = None) -> TraditionalLLMResult:
+    """Create the result for a call, with the prompt fingerprint and local token estimates filled in.
+
+    ``model`` defaults to ``OPENROUTER_MODEL``; a model that is not allowed raises ``ValueError``.
+    """
+    model = model or OPENROUTER_MODEL
+    check_model(model)
+    if prompt is TRADITIONAL_HUGE_PROMPT:
+        prompt_fingerprint, estimated_prompt_tokens = PROMPT_FINGERPRINT, PROMPT_ESTIMATED_TOKENS
+    else:
+        prompt_fingerprint, estimated_prompt_tokens = fingerprint(prompt), estimate_tokens(prompt)
+    result = TraditionalLLMResult(
+        text="",
+        model=model,
+        prompt_fingerprint=prompt_fingerprint,
+        estimated_prompt_tokens=estimated_prompt_tokens,
+        estimated_query_tokens=estimate_tokens(query),
+    )
+    TRADITIONAL_TOKENS.inc(estimated_prompt_tokens + result.estimated_query_tokens, model=model, kind="estimated_input")
+    return result
+
+
+def record_usage(result: TraditionalLLMResult, usage) -> None:
+    """Copy provider-reported usage onto the result and the aggregate counters."""
+    if usage is None:
+        return
+    result.prompt_tokens = usage.prompt_tokens
+    result.completion_tokens = usage.completion_tokens
+    result.total_tokens = usage.total_tokens
+    result.cost = getattr(usage, "cost", None)
+    TRADITIONAL_TOKENS.inc(usage.prompt_tokens, model=result.model, kind="prompt")
+    TRADITIONAL_TOKENS.inc(usage.completion_tokens, model=result.model, kind="completion")
+    if result.cost is not None:
+        TRADITIONAL_COST.inc(result.cost, model=result.model)
+
+
+def record_error(result: TraditionalLLMResult, e: BaseException) -> None:
+    """Mark ``result`` as failed and count the failure against the circuit breaker."""
+    if isinstance(e, CircuitOpenError):
+        CIRCUIT_REJECTIONS.inc(upstream="openrouter")
+        result.error = "circuit_open"
+        result.text = f"Error: {e}"
+        return
+    breaker_for(result.model).record_failure()
+    if isinstance(e, TimeoutError):
+        UPSTREAM_ERRORS.inc(upstream="openrouter", error_type="DeadlineExceeded")
+        result.error = "deadline_exceeded"
+        result.text = f"Error: traditional LLM call via OpenRouter exceeded its {OPENROUTER_DEADLINE:g}s deadline"
+    else:
+        UPSTREAM_ERRORS.inc(upstream="openrouter", error_type=type(e).__name__)
+        result.error = "upstream_error"
+        result.text = f"Error calling traditional LLM via OpenRouter: {str(e)}"
+
+
+def hedge_delay(model: Optional[str] = None) -> float:
+    """Seconds to wait before hedging: a high percentile of the model's recent call durations."""
+    observed = latency_for(model or OPENROUTER_MODEL).quantile(OPENROUTER_HEDGE_QUANTILE)
+    return max(OPENROUTER_HEDGE_MIN_DELAY, observed if observed is not None else OPENROUTER_HEDGE_DELAY)
+
+
+async def _create_completion(query: str, prompt: str, model: str):
+    async with openrouter_semaphore:
+        started = time.perf_counter()
+        response = await openai_client.chat.completions.create(
+            model=model,
             messages=[
                 {"role": "system", "content": prompt},
                 {"role": "user", "content": query}
             ],
             max_tokens=500,
-            temperature=0.7
+            temperature=0.7,
+            # Ask OpenRouter to include the call's cost in the usage block
+            extra_body={"usage": {"include": True}},
         )
-        return response.choices[0].message.content
+        latency_for(model).observe(time.perf_counter() - started)
+        return response
+
+
+async def call_traditional_llm_with_usage(query: str, prompt: str, model: Optional[str] = None) -> TraditionalLLMResult:
+    """Call the traditional LLM via OpenRouter and return the text with token usage.
+
+    ``model`` defaults to ``OPENROUTER_MODEL``. The call is bounded by
+    ``OPENROUTER_DEADLINE``, hedged after a slow first attempt and rejected
+    immediately while the model's circuit breaker is open. Failures are
+    reported through ``result.error``, never raised; only a model outside
+    ``COMPARE_ALLOWED_MODELS`` raises ``ValueError``.
+    """
+    result = start_traditional_result(query, prompt, model)
+    if not OPENROUTER_API_KEY:
+        result.error = "missing_api_key"
+        result.text = "Error: OPENROUTER_API_KEY not found. Please set it in your .env file."
+        return result
+    breaker = breaker_for(result.model)
+    try:
+        breaker.before_call()
+        async with asyncio.timeout(OPENROUTER_DEADLINE):
+            response = await hedged(
+                lambda: _create_completion(query, prompt, result.model),
+                delay=hedge_delay(result.model),
+                max_hedges=OPENROUTER_MAX_HEDGES,
+                on_hedge=lambda: OPENROUTER_HEDGES.inc(),
+            )
+        breaker.record_success()
+        result.text = response.choices[0].message.content
+        record_usage(result, response.usage)
+        return result
+    except asyncio.CancelledError:
+        breaker.release_probe()
+        raise
+    except Exception as e:
+        record_error(result, e)
+        return result
+
+
+async def stream_traditional_llm(query: str, prompt: str, result: TraditionalLLMResult) -> AsyncIterator[str]:
+    """Yield response text deltas as OpenRouter produces them.
+
+    ``result`` (from ``start_traditional_result``) receives the assembled text
+    and token usage once the stream ends. Errors are reported the same way as
+    ``call_traditional_llm_with_usage``: ``result.error`` is set, the text
+    becomes an error message and nothing more is yielded. Streams share the
+    deadline and circuit breaker but are not hedged, since tokens are
+    forwarded as soon as they arrive.
+
+    A background task reads OpenRouter into a buffer, so the concurrency slot
+    is released as soon as the upstream stream ends, however slowly the caller
+    consumes it. Closing the generator early cancels the upstream read without
+    counting it as a failure.
+    """
+    if not OPENROUTER_API_KEY:
+        result.error = "missing_api_key"
+        result.text = "Error: OPENROUTER_API_KEY not found. Please set it in your .env file."
+        return
+    # None marks the end; max_tokens bounds how many deltas can pile up
+    deltas: asyncio.Queue[Optional[str]] = asyncio.Queue()
+    reader = asyncio.create_task(_read_stream(query, prompt, result, deltas))
+    try:
+        while (delta := await deltas.get()) is not None:
+            yield delta
+        await reader
+    finally:
+        if not reader.done():
+            reader.cancel()
+
+
+async def _read_stream(query: str, prompt: str, result: TraditionalLLMResult, deltas: asyncio.Queue) -> None:
+    """Read one streamed completion into ``deltas`` and ``result``; always ends with None."""
+    breaker = breaker_for(result.model)
+    parts: list[str] = []
+    try:
+        breaker.before_call()
+        async with openrouter_semaphore:
+            async with asyncio.timeout(OPENROUTER_DEADLINE):
+                stream = await openai_client.chat.completions.create(
+                    model=result.model,
+                    messages=[
+                        {"role": "system", "content": prompt},
+                        {"role": "user", "content": query}
+                    ],
+                    max_tokens=500,
+                    temperature=0.7,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    extra_body={"usage": {"include": True}},
+                )
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage is not None:
+                            record_usage(result, chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            delta = chunk.choices[0].delta.content
+                            parts.append(delta)
+                            deltas.put_nowait(delta)
+        breaker.record_success()
+        result.text = "".join(parts)
+    except asyncio.CancelledError:
+        # The consumer went away; that says nothing about OpenRouter's health
+        breaker.release_probe()
+        raise
     except Exception as e:
-        return f"Error calling traditional LLM via OpenRouter: {str(e)}"
+        record_error(result, e)
+    finally:
+        deltas.put_nowait(None)
+
+
+async def call_traditional_llm(query: str, prompt: str) -> str:
+    """Call traditional LLM with the given query and prompt using OpenRouter."""
+    return (await call_traditional_llm_with_usage(query, prompt)).text
@@ -41,10 +41,15 @@ module.exports = {
       script: 'uv',
       args: 'run api_server.py',
       cwd: './backend',
+      // PM2 cluster mode only works for Node.js apps; uvicorn starts API_WORKERS
+      // worker processes itself, which share state through SHARED_STATE_PATH
       instances: 1,
       exec_mode: 'fork',
       env: {
         NODE_ENV: 'production',
+        API_WORKERS: process.env.API_WORKERS || '4',
+        API_RELOAD: 'false',
+        SHARED_STATE_PATH: process.env.SHARED_STATE_PATH || 'data/shared_state.db',
       },
       error_file: './logs/fastapi-backend-error.log',
       out_file: './logs/fastapi-backend-out.log',
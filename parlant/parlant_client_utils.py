@@ -1,18 +1,32 @@
 """Parlant client utilities for demo communication."""
 import parlant.sdk as p
-from parlant.client import AsyncParlantClient
-from typing import Optional
+from parlant.client import AsyncParlantClient, Event
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
 import asyncio
+import httpx
+import logging
 import os
+import time
 
+logger = logging.getLogger(__name__)
 
-async def create_client(base_url: str = "") -> AsyncParlantClient:
-    """Create a Parlant client connection."""
+
+async def create_client(
+    base_url: str = "",
+    httpx_client: Optional[httpx.AsyncClient] = None,
+    timeout: Optional[float] = None,
+) -> AsyncParlantClient:
+    """Create a Parlant client connection, optionally on a caller-provided httpx client.
+
+    With a custom ``httpx_client`` the library applies no request timeout
+    unless ``timeout`` is given.
+    """
     # Get from provided base_url or environment variable (required)
     resolved_base_url = base_url or os.getenv("PARLANT_BASE_URL")
     if not resolved_base_url:
         raise ValueError("PARLANT_BASE_URL environment variable is required. Please set it in your .env file.")
-    return AsyncParlantClient(base_url=resolved_base_url)
+    return AsyncParlantClient(base_url=resolved_base_url, timeout=timeout, httpx_client=httpx_client)
 
 
 async def create_session(client: AsyncParlantClient, agent_id: str, retries: int = 20, delay: float = 0.6) -> str:
@@ -30,6 +44,86 @@ async def create_session(client: AsyncParlantClient, agent_id: str, retries: int
     raise last_exc or RuntimeError(f"Failed to create session after {retries} attempts (server at {base_url}?).")
 
 
+class SessionPool:
+    """Keep a number of fresh, unused sessions for one agent ready in the background.
+
+    Sessions are handed out at most once. A background task refills the pool
+    whenever a session is taken and retires sessions older than ``max_age``
+    seconds. With ``size=0`` the pool is a pass-through to ``create_session``.
+    """
+
+    def __init__(self, client: AsyncParlantClient, agent_id: str, size: int = 4, max_age: float = 300.0):
+        self.client = client
+        self.agent_id = agent_id
+        self.size = max(0, size)
+        self.max_age = max_age
+        self._ready: deque[tuple[str, float]] = deque()
+        self._refill_needed = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+        # Deletions of retired sessions, kept so they are not garbage-collected mid-flight
+        self._deleting: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start the background refill task (no-op when disabled or already running)."""
+        if self.size and self._refill_task is None:
+            self._refill_task = asyncio.create_task(self._refill_loop())
+
+    async def close(self) -> None:
+        """Stop refilling and delete the sessions that were never handed out."""
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+        if self._deleting:
+            await asyncio.gather(*self._deleting, return_exceptions=True)
+        while self._ready:
+            session_id, _ = self._ready.popleft()
+            await self._delete_session(session_id)
+
+    async def acquire(self) -> str:
+        """Take a ready session, falling back to creating one on the spot."""
+        self._retire_expired()
+        self._refill_needed.set()
+        if self._ready:
+            session_id, _ = self._ready.popleft()
+            return session_id
+        return await create_session(self.client, self.agent_id)
+
+    def _retire_expired(self) -> None:
+        # Sessions are appended in creation order, so expired ones sit at the front
+        cutoff = time.monotonic() - self.max_age
+        while self._ready and self._ready[0][1] < cutoff:
+            session_id, _ = self._ready.popleft()
+            task = asyncio.create_task(self._delete_session(session_id))
+            self._deleting.add(task)
+            task.add_done_callback(self._deleting.discard)
+
+    async def _delete_session(self, session_id: str) -> None:
+        try:
+            await self.client.sessions.delete(session_id=session_id)
+        except Exception as exc:
+            logger.debug(f"Failed to delete pooled session {session_id}: {exc}")
+
+    async def _refill_loop(self) -> None:
+        while True:
+            self._refill_needed.clear()
+            self._retire_expired()
+            try:
+                while len(self._ready) < self.size:
+                    session_id = await create_session(self.client, self.agent_id)
+                    self._ready.append((session_id, time.monotonic()))
+            except Exception as exc:
+                logger.warning(f"Session pool refill failed: {type(exc).__name__}: {exc}")
+            # Wake up when a session is taken, or periodically to retire stale ones
+            try:
+                await asyncio.wait_for(self._refill_needed.wait(), timeout=max(1.0, self.max_age / 2))
+            except asyncio.TimeoutError:
+                pass
+
+
 async def send_user_message(client: AsyncParlantClient, session_id: str, message: str) -> int:
     """Send a user message to the Parlant session."""
     event = await client.sessions.create_event(
@@ -41,50 +135,181 @@ async def send_user_message(client: AsyncParlantClient, session_id: str, message
     return event.offset
 
 
-async def await_ai_reply(client: AsyncParlantClient, session_id: str, min_offset: int) -> Optional[str]:
-    """Wait for and collect all AI agent messages from a Parlant session."""
-    all_messages = []
-    current_offset = min_offset
-    max_polls = 3
+class SessionEventCollector:
+    """Fetch each session event once and keep a typed index of them by offset.
+
+    ``await_ai_reply`` fills the collector while it waits for the reply and
+    ``get_session_reasoning`` summarizes the same index without another round trip.
+    """
+
+    KINDS = "message,tool,status"
+
+    def __init__(self, client: AsyncParlantClient, session_id: str, min_offset: int = 0):
+        self.client = client
+        self.session_id = session_id
+        self.next_offset = min_offset
+        self.by_kind: dict[str, dict[int, Event]] = {"message": {}, "tool": {}, "status": {}}
+
+    async def fetch(self, wait_for_data: int = 0) -> list[Event]:
+        """Fetch events past the last seen offset, index them and return the new ones."""
+        events = await self.client.sessions.list_events(
+            session_id=self.session_id,
+            kinds=self.KINDS,
+            min_offset=self.next_offset,
+            wait_for_data=wait_for_data,
+        )
+        new_events: list[Event] = []
+        for event in events:
+            index = self.by_kind.setdefault(event.kind, {})
+            if event.offset in index:
+                continue
+            index[event.offset] = event
+            new_events.append(event)
+            self.next_offset = max(self.next_offset, event.offset + 1)
+        return new_events
+
+    @property
+    def messages(self) -> list[Event]:
+        return [self.by_kind["message"][o] for o in sorted(self.by_kind["message"])]
+
+    @property
+    def tools(self) -> list[Event]:
+        return [self.by_kind["tool"][o] for o in sorted(self.by_kind["tool"])]
+
+    @property
+    def statuses(self) -> list[Event]:
+        return [self.by_kind["status"][o] for o in sorted(self.by_kind["status"])]
+
+    def events(self) -> list[Event]:
+        """Return every collected event in offset order."""
+        return sorted(
+            (event for index in self.by_kind.values() for event in index.values()),
+            key=lambda event: event.offset,
+        )
+
+
+# Agent status values that mark the end of the agent's turn
+TURN_COMPLETE_STATUSES = frozenset({"ready", "cancelled", "error"})
+
+
+def _is_timeout_error(exc: Exception) -> bool:
+    return "timeout" in str(exc).lower() or "504" in str(exc)
+
+
+async def iter_turn_events(
+    client: AsyncParlantClient,
+    session_id: str,
+    min_offset: int,
+    timeout: float = 90.0,
+    poll_wait: int = 10,
+    collector: Optional[SessionEventCollector] = None,
+) -> AsyncIterator[Event]:
+    """Yield message, tool and status events of the agent's turn as they arrive.
+
+    Each long-poll resumes from the offset after the last event seen, so every
+    event is yielded once. The turn ends as soon as the agent reports a
+    ``ready`` (or ``cancelled``/``error``) status; ``timeout`` bounds the
+    whole wait. If the server emits no status events, a poll window with no
+    new events after at least one message also ends the turn.
+    """
+    if collector is None:
+        collector = SessionEventCollector(client, session_id, min_offset)
+    seen_message = False
+    deadline = time.monotonic() + timeout
     
-    for poll_count in range(max_polls):
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
         try:
-            events = await client.sessions.list_events(
-                session_id=session_id,
-                kinds="message",
-                min_offset=current_offset,
-                wait_for_data=45,
-            )
+            events = await collector.fetch(wait_for_data=max(1, int(min(poll_wait, remaining))))
         except Exception as e:
-            if "timeout" in str(e).lower() or "504" in str(e):
-                break
+            if _is_timeout_error(e):
+                if seen_message:
+                    return
+                continue
             raise
         
-        new_messages = []
-        max_offset = current_offset - 1
+        if not events:
+            if seen_message:
+                return
+            continue
         
+        turn_complete = False
         for event in events:
-            if event.source == "ai_agent" and event.kind == "message":
-                if isinstance(event.data, dict) and event.data.get("message"):
-                    new_messages.append(event.data.get("message"))
-                    max_offset = max(max_offset, event.offset)
+            yield event
+            if event.source != "ai_agent" or not isinstance(event.data, dict):
+                continue
+            if event.kind == "message" and event.data.get("message"):
+                seen_message = True
+            elif event.kind == "status" and event.data.get("status") in TURN_COMPLETE_STATUSES:
+                turn_complete = True
         
-        if new_messages:
-            all_messages.extend(new_messages)
-            current_offset = max_offset + 1
-        else:
-            break
+        if turn_complete:
+            return
+
+
+async def await_ai_reply(
+    client: AsyncParlantClient,
+    session_id: str,
+    min_offset: int,
+    timeout: float = 90.0,
+    poll_wait: int = 10,
+    collector: Optional[SessionEventCollector] = None,
+    on_event: Optional[Callable[[Event], Awaitable[None]]] = None,
+) -> Optional[str]:
+    """Wait for and collect all AI agent messages from a Parlant session.
+
+    See ``iter_turn_events`` for when the turn is considered complete. Pass a
+    ``collector`` to keep the fetched events for ``get_session_reasoning``,
+    and ``on_event`` to be called with each event as it arrives.
+    """
+    all_messages: list[str] = []
+    async for event in iter_turn_events(client, session_id, min_offset, timeout, poll_wait, collector):
+        if on_event is not None:
+            await on_event(event)
+        if (
+            event.source == "ai_agent"
+            and event.kind == "message"
+            and isinstance(event.data, dict)
+            and event.data.get("message")
+        ):
+            all_messages.append(event.data.get("message"))
     
     return "\n\n".join(all_messages) if all_messages else None
 
 
-async def get_session_reasoning(client: AsyncParlantClient, session_id: str, min_offset: int = 0) -> str:
-    """Summarize which guidelines and tools the agent used for this session."""
-    guidelines: list[str] = []
-    tools_used: list[str] = []
-    guideline_details: list[str] = []
+async def get_session_reasoning(
+    client: AsyncParlantClient,
+    session_id: str,
+    min_offset: int = 0,
+    collector: Optional[SessionEventCollector] = None,
+) -> str:
+    """Summarize which guidelines and tools the agent used for this session.
+
+    The applied guideline ids come from one ``sessions.retrieve`` call. With a
+    ``collector`` already filled by ``await_ai_reply`` the tool and status
+    events come from its index instead of listing every event again.
+    """
+    guidelines = await get_applied_guideline_ids(client, session_id)
+    if collector is not None:
+        return summarize_reasoning(collector.events(), guidelines)
+
+    try:
+        events = await client.sessions.list_events(
+            session_id=session_id,
+            min_offset=0,
+            wait_for_data=0,
+        )
+    except Exception:
+        events = []
+
+    return summarize_reasoning(events, guidelines)
+
 
-    # Get session state for applied guidelines
+async def get_applied_guideline_ids(client: AsyncParlantClient, session_id: str) -> list[str]:
+    """Return the guideline ids the session's agent states record as applied (empty on error)."""
+    guidelines: list[str] = []
     try:
         session_info = await client.sessions.retrieve(session_id=session_id)
         agent_states = getattr(session_info, "agent_states", None) or []
@@ -95,15 +320,17 @@ async def get_session_reasoning(client: AsyncParlantClient, session_id: str, min
                     guidelines.append(gid)
     except Exception:
         pass
+    return guidelines
+
+
+def summarize_reasoning(events: Iterable[Event], guidelines: Optional[list[str]] = None) -> str:
+    """Build the guideline/tool summary from a sequence of session events."""
+    guidelines = list(guidelines or [])
+    tools_used: list[str] = []
+    guideline_details: list[str] = []
 
     # Scan events for tool calls and guideline details
     try:
-        events = await client.sessions.list_events(
-            session_id=session_id,
-            min_offset=0,
-            wait_for_data=0,
-        )
-        
         for ev in events:
             # Extract guidelines from status events
             if ev.kind == "status" and isinstance(ev.data, dict):